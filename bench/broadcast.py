@@ -0,0 +1,89 @@
+"""Стоимость одной рассылки Table.notify_clients в зависимости от числа телефонов за столом.
+
+Запуск: python -m bench.broadcast
+"""
+import asyncio
+import json
+import time
+
+from data.obj import Game, Table
+from data.table.events import TableEvent
+from data.table.models import GameState
+
+TABLE_SIZES = (1, 10, 30, 100)
+ROUNDS = 200
+
+
+class NullConnection:
+    async def send_text(self, data: str):
+        pass
+
+    async def send_json(self, data):
+        # Как Starlette WebSocket.send_json
+        json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+    async def close(self):
+        pass
+
+
+async def legacy_notify_clients(table: Table):
+    """Старый путь: отдельная сборка и сериализация TableEvent для каждого клиента."""
+    async def send(client):
+        question = table.game.question_manager.current_question
+        if question:
+            question = question.get_model()
+        data = TableEvent(
+            table_id=table.id,
+            role=client.role,
+            clients=len(table.observers) + 1,
+            table_state=table.state,
+            table_name=table.name,
+            question=question,
+            table_answers=table.table_answers,
+            answered=table.answered,
+            result=table.get_to_table_result(),
+        ).model_dump(mode="json")
+        await client.connection.send_json(data)
+
+    await asyncio.gather(*[send(c) for c in table.observers + ([table.leader] if table.leader else [])])
+
+
+async def skip_write_game(*args, **kwargs):
+    pass
+
+
+async def make_table(clients: int, state: GameState) -> Table:
+    game = Game()
+    game.write_game = skip_write_game  # бенчмарк не должен перезаписывать game_state.json
+    table = game.get_table(1)
+    for _ in range(clients):
+        await table.add_client(NullConnection())
+    await game.start()
+    if state == GameState.in_results:
+        await game.show_results()
+    return table
+
+
+async def measure(notify, table: Table) -> float:
+    start = time.process_time()
+    for _ in range(ROUNDS):
+        await notify(table)
+        # Даём задачам-писателям сокетов отправить разосланное
+        await asyncio.sleep(0)
+    return (time.process_time() - start) / ROUNDS * 1000
+
+
+async def main():
+    print(f"{'state':<12}{'clients':>8}{'legacy, ms':>14}{'once, ms':>12}{'speedup':>10}")
+    for state in (GameState.in_question, GameState.in_results):
+        for size in TABLE_SIZES:
+            table = await make_table(size, state)
+            legacy = await measure(legacy_notify_clients, table)
+            once = await measure(Table.notify_clients, table)
+            for client in table.observers + [table.leader]:
+                client.outbox.stop()
+            print(f"{state.value:<12}{size:>8}{legacy:>14.3f}{once:>12.3f}{legacy / once:>9.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
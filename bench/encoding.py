@@ -0,0 +1,85 @@
+"""Сериализация исходящих событий: прежний путь (model_dump + json, как WebSocket.send_json) против data/wire.py.
+
+Запуск: python -m bench.encoding
+"""
+import asyncio
+import json
+import time
+
+from data import wire
+from data.obj import Game
+from data.table.events import ErrorEvent, TimerEvent, TableEvent, ScreenTablesStateEvent, TableData
+from data.table.models import ClientRole
+
+ROUNDS = 2000
+
+
+def legacy(model) -> str:
+    return json.dumps(model.model_dump(mode="json"), separators=(",", ":"), ensure_ascii=False)
+
+
+def measure(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def skip_write_game(*args, **kwargs):
+    pass
+
+
+async def make_events() -> dict:
+    game = Game()
+    game.write_game = skip_write_game
+    await game.resize_tables(100)
+    await game.start()
+    for table in game.tables.values():
+        await table.answer_question([0])
+    await game.show_answers()
+    await game.show_results()
+    table = game.get_table(1)
+    question = game.question_manager.current_question
+    return {
+        "error": ErrorEvent(error="Not allowed to set answers"),
+        "timer": TimerEvent(question_id=question.id, time_left=12.5, deadline=time.time(), paused=False, closed=False),
+        "table (results)": TableEvent(
+            table_id=table.id,
+            role=ClientRole.leader,
+            clients=1,
+            table_state=table.state,
+            table_name=table.name,
+            question=question.get_model(),
+            table_answers=table.table_answers,
+            answered=table.answered,
+            result=table.get_to_table_result(),
+        ),
+        "screen (100 tables)": ScreenTablesStateEvent(
+            game_state=game.state,
+            tables=[TableData(
+                table_id=t.id, table_name=t.name, table_state=t.state, clients=0,
+                table_answers=t.table_answers, answered=t.answered,
+            ) for t in game.tables.values()],
+            question=question.get_model(),
+            results=game.calc_results(),
+        ),
+    }
+
+
+def main():
+    events = asyncio.run(make_events())
+    print(f"json encoder: {'orjson' if wire.orjson is not None else 'stdlib json'}")
+    print(f"{'event':<22}{'bytes':>8}{'legacy, us':>12}{'dict+wire, us':>15}{'model, us':>12}{'speedup':>9}")
+    for name, event in events.items():
+        rounds = ROUNDS if len(legacy(event)) < 10000 else ROUNDS // 10
+        data = event.model_dump(mode="json")
+        assert json.loads(wire.dumps(data)) == json.loads(wire.dumps_model(event)) == data
+        old = measure(lambda: legacy(event), rounds)
+        via_dict = measure(lambda: wire.dumps(event.model_dump(mode="json")), rounds)
+        direct = measure(lambda: wire.dumps_model(event), rounds)
+        print(f"{name:<22}{len(wire.dumps_model(event).encode()):>8}{old:>12.1f}{via_dict:>15.1f}{direct:>12.1f}"
+              f"{old / direct:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Разбор входящих событий стола: прежний путь (json.loads, словарь обработчиков на каждое сообщение, Model(**data))
+против EventRouter (validate_json по event_type) и полная обработка кадра Client.ws_handler на одном сокете:
+без лимитов и сверх лимита (сообщение отбрасывается до разбора).
+
+Запуск: python -m bench.handlers
+"""
+import asyncio
+import json
+import time
+
+from data.obj import Client, Game
+from data.ratelimit import RateLimiter
+from data.table.events import FromClientEventTypes, FromSetTableNameEvent, FromSetTableAnswersEvent, \
+    FromAnswerQuestionEvent, FromResyncEvent, FromPongEvent
+
+ROUNDS = 20000
+
+FRAMES = {
+    "from_pong": json.dumps({"event_type": "from_pong", "id": 1, "client_time": time.time()}),
+    "from_set_table_answers": json.dumps({"event_type": "from_set_table_answers", "table_answers": [0, 2]}),
+    "from_resync": json.dumps({"event_type": "from_resync"}),
+}
+
+
+class FakeSocket:
+    async def send_text(self, text: str):
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def legacy_decode(frame: str):
+    # Как было: dict из json.loads, таблица методов собирается на каждое сообщение, модель из dict
+    data = json.loads(frame)
+    models = {
+        FromClientEventTypes.from_set_table_name: FromSetTableNameEvent,
+        FromClientEventTypes.from_set_table_answers: FromSetTableAnswersEvent,
+        FromClientEventTypes.from_answer_question: FromAnswerQuestionEvent,
+        FromClientEventTypes.from_resync: FromResyncEvent,
+        FromClientEventTypes.from_pong: FromPongEvent,
+    }
+    return models[data.get("event_type")](**data)
+
+
+def measure(func, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+async def measure_async(func, frame: str, rounds: int) -> float:
+    """Сообщений в секунду, которые один сокет проводит через ws_handler."""
+    start = time.perf_counter()
+    for i in range(rounds):
+        await func(frame)
+        if i % 32 == 0:
+            # Дать писателю очереди сокета отправить накопленное
+            await asyncio.sleep(0)
+    return rounds / (time.perf_counter() - start)
+
+
+async def skip_write_game(*args, **kwargs):
+    pass
+
+
+async def run():
+    game = Game()
+    game.write_game = skip_write_game
+    await game.resize_tables(1)
+    await game.start()
+    table = game.get_table(1)
+    client = await table.add_client(FakeSocket())
+    unlimited, exhausted = RateLimiter({}), RateLimiter({"*": (0, 0)})
+
+    async def flood(frame: str):
+        # Сокет не закрывается по QUIZ_RATE_LIMIT_DISCONNECT: замеряется только отбрасывание
+        client.dropped = 0
+        await client.ws_handler(frame)
+
+    print(f"{'event':<26}{'legacy, us':>12}{'router, us':>12}{'speedup':>9}{'ws_handler, msg/s':>20}"
+          f"{'dropped, msg/s':>17}")
+    for name, frame in FRAMES.items():
+        assert legacy_decode(frame) == Client.router.decode(frame)
+        old = measure(lambda: legacy_decode(frame), ROUNDS)
+        new = measure(lambda: Client.router.decode(frame), ROUNDS)
+        client.limiter = table.limiter = unlimited
+        rate = await measure_async(client.ws_handler, frame, ROUNDS // 4)
+        client.limiter = exhausted
+        dropped = await measure_async(flood, frame, ROUNDS)
+        print(f"{name:<26}{old:>12.2f}{new:>12.2f}{old / new:>8.1f}x{rate:>20.0f}{dropped:>17.0f}")
+    client.outbox.stop()
+
+
+def main():
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Микробенчмарки подсчёта очков и сериализации на разных размерах игры.
+
+Запуск и сохранение базовой линии:
+    python -m bench.hotpaths --save bench/baseline.json
+Сравнение с ней перед мероприятием (код возврата 1, если что-то стало медленнее --threshold раз):
+    python -m bench.hotpaths --compare bench/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict
+
+from data import wire
+from data.obj import Game
+from data.question import QuestionManager, Result
+from data.queststion_conf import QUESTIONS
+from data.quiz import Quiz
+
+TABLE_COUNTS = (8, 100, 1000)
+# Во сколько раз повторить вопросы квиза
+QUESTION_MULTIPLIERS = (1, 4)
+
+
+def measure(func: Callable, repeat: int = 5, min_time: float = 0.05) -> dict:
+    """Время одного вызова func в микросекундах: подбирает число вызовов, как timeit.autorange."""
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - start >= min_time:
+            break
+        number *= 2
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / number * 1e6)
+    return {"min_us": round(min(timings), 3), "median_us": round(statistics.median(timings), 3), "number": number}
+
+
+async def skip_write_game(*args, **kwargs):
+    pass
+
+
+async def make_game(tables: int, questions: list) -> Game:
+    """Игра в фазе итогов: все столы ответили на все вопросы случайно."""
+    rng = random.Random(tables)
+    game = Game()
+    game.write_game = skip_write_game
+    game.question_manager = QuestionManager(Quiz.from_dicts("bench", questions))
+    await game.resize_tables(tables)
+    for table in game.tables.values():
+        for question in game.question_manager.questions:
+            answers = rng.sample(range(len(question.answers)), rng.randint(1, len(question.answers)))
+            table.result.answer_question(question, answers)
+    await game.show_results()
+    return game
+
+
+def bench_scoring(results: Dict[str, dict]):
+    question = QuestionManager().questions[3]
+    correct, answers = question.correct_answers, [0, 2]
+    results["Result.f1_score_based_points"] = measure(
+        lambda: Result.f1_score_based_points(correct, answers, question.score))
+    result = Result()
+    results["Result.answer_question"] = measure(lambda: result.answer_question(question, answers))
+    results["QuestionObject.get_model"] = measure(question.get_model)
+
+
+def bench_game(results: Dict[str, dict], tables: int, multiplier: int):
+    questions = QUESTIONS * multiplier
+    game = asyncio.run(make_game(tables, questions))
+    table = game.get_table(1)
+    suffix = f"[tables={tables},questions={len(questions)}]"
+
+    def table_event():
+        return wire.dumps(table.build_table_event())
+
+    results["Table.build_table_event+dumps" + suffix] = measure(table_event)
+    results["Game.calc_results" + suffix] = measure(game.calc_results)
+    results["Game.get_table_place_categories" + suffix] = measure(lambda: game.get_table_place_categories(table))
+    results["Game.get_full_game_data" + suffix] = measure(game.get_full_game_data)
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> bool:
+    ok = True
+    print(f"{'benchmark':<70}{'base, us':>12}{'now, us':>12}{'ratio':>8}")
+    for name, stats in results.items():
+        base = baseline.get(name)
+        if base is None:
+            print(f"{name:<70}{'-':>12}{stats['min_us']:>12.2f}")
+            continue
+        ratio = stats["min_us"] / base["min_us"] if base["min_us"] else 1.0
+        mark = "  REGRESSION" if ratio > threshold else ""
+        ok = ok and ratio <= threshold
+        print(f"{name:<70}{base['min_us']:>12.2f}{stats['min_us']:>12.2f}{ratio:>8.2f}{mark}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save", help="сохранить результаты в json")
+    parser.add_argument("--compare", help="сравнить с сохранёнными результатами")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--tables", type=int, nargs="*", default=TABLE_COUNTS)
+    args = parser.parse_args()
+
+    results: Dict[str, dict] = {}
+    bench_scoring(results)
+    for tables in args.tables:
+        for multiplier in QUESTION_MULTIPLIERS:
+            bench_game(results, tables, multiplier)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        if not compare(results, baseline, args.threshold):
+            sys.exit(1)
+    elif not args.save:
+        for name, stats in results.items():
+            print(f"{name:<70}{stats['min_us']:>12.2f} us")
+
+
+if __name__ == "__main__":
+    main()
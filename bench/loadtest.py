@@ -0,0 +1,280 @@
+"""Нагрузочный прогон полной игры: N экранов, M столов по 1 + K телефонов и ведущий.
+
+Сценарий: подключение и названия столов, затем по каждому вопросу черновики ответов
+(from_set_table_answers), финальный ответ (from_answer_question) и from_admin_next_step,
+в конце from_admin_show_results. По каждой фазе печатается p50/p99 задержки рассылки
+(от действия до первого сообщения на каждом сокете), сообщений в секунду и CPU сервера.
+
+По умолчанию сервер поднимается в этом же процессе и сокеты работают напрямую через ASGI,
+без сети и дополнительных зависимостей (CPU тогда включает и самих клиентов):
+    python -m bench.loadtest --screens 2 --tables 50 --observers 5
+
+Против запущенного сервера (нужен пакет websockets, CPU сервера берётся из /proc по --server-pid):
+    python -m bench.loadtest --url ws://localhost:8000 --server-pid 12345
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import random
+import statistics
+import time
+import uuid
+from typing import Dict, List
+
+
+class AsgiWebSocket:
+    """Сокет, подключенный к ASGI-приложению напрямую, без сети."""
+
+    def __init__(self, app, path: str):
+        self.app = app
+        self.path = path
+        self._to_server: asyncio.Queue = asyncio.Queue()
+        self._from_server: asyncio.Queue = asyncio.Queue()
+        self._accepted = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    async def connect(self):
+        scope = {
+            "type": "websocket", "asgi": {"version": "3.0"}, "scheme": "ws", "http_version": "1.1",
+            "path": self.path, "raw_path": self.path.encode(), "root_path": "", "query_string": b"",
+            "headers": [], "server": ("loadtest", 80), "client": ("loadtest", 0), "subprotocols": [],
+        }
+        self._task = asyncio.create_task(self.app(scope, self._to_server.get, self._send))
+        await self._to_server.put({"type": "websocket.connect"})
+        await self._accepted.wait()
+
+    async def _send(self, message: dict):
+        if message["type"] == "websocket.accept":
+            self._accepted.set()
+        elif message["type"] == "websocket.send":
+            await self._from_server.put(message.get("text") or message.get("bytes").decode())
+        elif message["type"] == "websocket.close":
+            self._accepted.set()
+            await self._from_server.put(None)
+
+    async def send(self, text: str):
+        await self._to_server.put({"type": "websocket.receive", "text": text})
+
+    async def recv(self) -> str | None:
+        return await self._from_server.get()
+
+    async def close(self):
+        await self._to_server.put({"type": "websocket.disconnect", "code": 1000})
+
+
+class NetworkWebSocket:
+    """Сокет к серверу по сети через пакет websockets."""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._ws = None
+
+    async def connect(self):
+        import websockets
+        self._ws = await websockets.connect(self.url, max_size=None)
+
+    async def send(self, text: str):
+        await self._ws.send(text)
+
+    async def recv(self) -> str | None:
+        try:
+            return await self._ws.recv()
+        except Exception:
+            return None
+
+    async def close(self):
+        await self._ws.close()
+
+
+class Peer:
+    """Подключение нагрузочного теста: складывает время прихода сообщений и последнее состояние."""
+
+    def __init__(self, kind: str, socket):
+        self.kind = kind
+        self.socket = socket
+        self.received: List[float] = []
+        self.state: dict | None = None
+        self._reader: asyncio.Task | None = None
+
+    async def start(self):
+        await self.socket.connect()
+        self._reader = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            text = await self.socket.recv()
+            if text is None:
+                return
+            message = json.loads(text)
+            if message.get("event_type") == "ping":
+                # Замер задержки сервером не относится к рассылкам, на него только отвечаем
+                await self.send({"event_type": "from_pong", "id": message["id"], "client_time": time.time()})
+                continue
+            if message.get("event_type") == "clock":
+                continue
+            self.received.append(time.perf_counter())
+            if message.get("event_type") in ("table", "screen_tables_state"):
+                self.state = message
+
+    async def send(self, data: dict):
+        await self.socket.send(json.dumps(data))
+
+    def first_after(self, t0: float) -> float | None:
+        i = bisect.bisect_left(self.received, t0)
+        return self.received[i] if i < len(self.received) else None
+
+    async def stop(self):
+        await self.socket.close()
+        if self._reader:
+            self._reader.cancel()
+
+
+def server_cpu(pid: int | None) -> float:
+    if pid is None:
+        return time.process_time()
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+class LoadTest:
+    def __init__(self, args, connect):
+        self.args = args
+        self.connect = connect
+        self.game = args.game or f"loadtest-{uuid.uuid4().hex[:6]}"
+        self.admin: Peer | None = None
+        self.screens: List[Peer] = []
+        self.leaders: List[Peer] = []
+        self.observers: List[Peer] = []
+        self.report: Dict[str, dict] = {}
+
+    @property
+    def peers(self) -> List[Peer]:
+        return self.screens + self.leaders + self.observers
+
+    async def open(self, kind: str, path: str) -> Peer:
+        peer = Peer(kind, self.connect(f"/ws/{self.game}/{path}"))
+        await peer.start()
+        return peer
+
+    async def phase(self, name: str, action, peers: List[Peer] | None = None, timeout: float = 10.0):
+        """Выполнить действие и дождаться, пока каждый из peers (по умолчанию все) получит сообщение после него."""
+        cpu0, t0 = server_cpu(self.args.server_pid), time.perf_counter()
+        count0 = sum(len(p.received) for p in self.peers)
+        await action()
+        if peers is None:
+            peers = self.peers
+        deadline = t0 + timeout
+        while time.perf_counter() < deadline:
+            if all(p.first_after(t0) is not None for p in peers):
+                break
+            await asyncio.sleep(0.005)
+        # Дать долететь хвосту рассылки (отложенные черновики и т.п.)
+        await asyncio.sleep(self.args.settle)
+        wall = time.perf_counter() - t0
+        latencies = [(p.first_after(t0) - t0) * 1000 for p in peers if p.first_after(t0) is not None]
+        messages = sum(len(p.received) for p in self.peers) - count0
+        stats = self.report.setdefault(name, {"latencies": [], "messages": 0, "wall": 0.0, "cpu": 0.0, "missed": 0})
+        stats["latencies"].extend(latencies)
+        stats["messages"] += messages
+        stats["wall"] += wall
+        stats["cpu"] += server_cpu(self.args.server_pid) - cpu0
+        stats["missed"] += len(peers) - len(latencies)
+
+    async def run(self):
+        args = self.args
+        self.admin = await self.open("admin", "admin")
+        await self.admin.send({"event_type": "from_admin_reset_game"})
+        await self.admin.send({"event_type": "from_admin_resize_tables", "count": args.tables})
+        await asyncio.sleep(0.1)
+
+        async def join():
+            for _ in range(args.screens):
+                self.screens.append(await self.open("screen", "screen"))
+            for table_id in range(1, args.tables + 1):
+                self.leaders.append(await self.open("leader", f"table/{table_id}"))
+                for _ in range(args.observers):
+                    self.observers.append(await self.open("observer", f"table/{table_id}"))
+
+        await self.phase("join", join)
+
+        async def set_names():
+            for i, leader in enumerate(self.leaders, start=1):
+                await leader.send({"event_type": "from_set_table_name", "table_name": f"Стол {i}"})
+
+        await self.phase("set_name", set_names)
+
+        for _ in range(args.questions):
+            await self.phase("next_question", self.next_step)
+            question = next((p.state or {}).get("question") for p in self.leaders)
+            if not question:
+                break
+            variants = len(question["answers"])
+
+            async def drafts():
+                for _ in range(args.drafts):
+                    for leader in self.leaders:
+                        answers = random.sample(range(variants), random.randint(1, variants))
+                        await leader.send({"event_type": "from_set_table_answers", "table_answers": answers})
+
+            async def answers():
+                for leader in self.leaders:
+                    await leader.send({"event_type": "from_answer_question", "table_answers": [random.randrange(variants)]})
+
+            # Черновики видят только телефоны своего стола
+            await self.phase("draft_answers", drafts, peers=self.leaders + self.observers)
+            await self.phase("answer_question", answers)
+            await self.phase("show_answers", self.next_step)
+
+        await self.phase("show_results", lambda: self.admin.send({"event_type": "from_admin_show_results"}))
+
+        for peer in self.peers + [self.admin]:
+            await peer.stop()
+
+    async def next_step(self):
+        await self.admin.send({"event_type": "from_admin_next_step"})
+
+    def print_report(self):
+        print(f"game {self.game}: {len(self.screens)} screens, {len(self.leaders)} tables, "
+              f"{len(self.leaders) + len(self.observers)} phones")
+        print(f"{'phase':<16}{'p50, ms':>10}{'p99, ms':>10}{'msg/s':>10}{'messages':>10}{'cpu, s':>9}{'missed':>8}")
+        for name, stats in self.report.items():
+            latencies = sorted(stats["latencies"]) or [0.0]
+            p50 = statistics.median(latencies)
+            p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            rate = stats["messages"] / stats["wall"] if stats["wall"] else 0
+            print(f"{name:<16}{p50:>10.1f}{p99:>10.1f}{rate:>10.0f}{stats['messages']:>10}"
+                  f"{stats['cpu']:>9.2f}{stats['missed']:>8}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--screens", type=int, default=2)
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--observers", type=int, default=3, help="телефонов за столом кроме лидера")
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--drafts", type=int, default=3, help="черновиков ответа лидера на вопрос")
+    parser.add_argument("--settle", type=float, default=0.1, help="пауза после каждой фазы, с")
+    parser.add_argument("--game", help="код игры (по умолчанию новая игра loadtest-*)")
+    parser.add_argument("--url", help="ws://host:port запущенного сервера; без него сервер в этом процессе")
+    parser.add_argument("--server-pid", type=int, help="pid сервера для замера CPU при --url")
+    args = parser.parse_args()
+
+    if args.url:
+        test = LoadTest(args, lambda path: NetworkWebSocket(args.url + path))
+        await test.run()
+    else:
+        # Нагрузочный прогон не должен трогать журнал и game_state.json настоящих игр
+        os.environ.setdefault("QUIZ_JOURNAL_DIR", "")
+        os.environ.setdefault("QUIZ_GAME_STATE_PATH", "")
+        from main import app
+        async with app.router.lifespan_context(app):
+            test = LoadTest(args, lambda path: AsgiWebSocket(app, path))
+            await test.run()
+    test.print_report()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
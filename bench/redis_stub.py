@@ -0,0 +1,82 @@
+"""Минимальный сервер pub/sub с протоколом Redis для локальной проверки общего бэкенда состояния.
+
+Поддерживает только то, что использует RedisBackend: PING, AUTH, PUBLISH, SUBSCRIBE, PSUBSCRIBE.
+
+Запуск: python -m bench.redis_stub --port 6379
+затем несколько воркеров: QUIZ_STATE_BACKEND=redis://localhost:6379 uvicorn main:app --workers 4
+"""
+import argparse
+import asyncio
+import fnmatch
+from typing import Dict, List
+
+from data.backend import read_reply
+
+
+def bulk(data: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+def array(*items: bytes) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+
+class PubSubStub:
+    def __init__(self):
+        self.channels: Dict[bytes, List[asyncio.StreamWriter]] = {}
+        self.patterns: Dict[bytes, List[asyncio.StreamWriter]] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await read_reply(reader)
+                name, args = command[0].upper(), command[1:]
+                if name == b"PUBLISH":
+                    writer.write(b":%d\r\n" % self.publish(args[0], args[1]))
+                elif name in (b"SUBSCRIBE", b"PSUBSCRIBE"):
+                    registry = self.channels if name == b"SUBSCRIBE" else self.patterns
+                    for i, channel in enumerate(args, start=1):
+                        registry.setdefault(channel, []).append(writer)
+                        writer.write(array(bulk(name.lower()), bulk(channel), b":%d\r\n" % i))
+                elif name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"AUTH":
+                    writer.write(b"+OK\r\n")
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % name)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for registry in (self.channels, self.patterns):
+                for writers in registry.values():
+                    if writer in writers:
+                        writers.remove(writer)
+            writer.close()
+
+    def publish(self, channel: bytes, data: bytes) -> int:
+        receivers = 0
+        for writer in self.channels.get(channel, []):
+            writer.write(array(bulk(b"message"), bulk(channel), bulk(data)))
+            receivers += 1
+        for pattern, writers in self.patterns.items():
+            if fnmatch.fnmatchcase(channel.decode(), pattern.decode()):
+                for writer in writers:
+                    writer.write(array(bulk(b"pmessage"), bulk(pattern), bulk(channel), bulk(data)))
+                    receivers += 1
+        return receivers
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    server = await asyncio.start_server(PubSubStub().handle, args.host, args.port)
+    print(f"Listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
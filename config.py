@@ -0,0 +1,68 @@
+import os
+
+# Игра, к которой подключаются старые адреса без кода игры (/ws/table/{id}, /ws/screen, /ws/admin)
+DEFAULT_GAME = os.environ.get("QUIZ_DEFAULT_GAME", "default")
+# Игра без подключений удаляется из памяти через столько секунд
+GAME_IDLE_TIMEOUT = float(os.environ.get("QUIZ_GAME_IDLE_TIMEOUT", 3600))
+GAME_EVICT_INTERVAL = float(os.environ.get("QUIZ_GAME_EVICT_INTERVAL", 60))
+MAX_GAMES = int(os.environ.get("QUIZ_MAX_GAMES", 500))
+# "memory" - всё состояние в одном процессе; "redis://host:port" - общее состояние для нескольких
+# воркеров uvicorn / узлов через pub/sub сервера с протоколом Redis
+STATE_BACKEND = os.environ.get("QUIZ_STATE_BACKEND", "memory")
+# Сколько секунд новая копия игры в общем бэкенде ждёт состояние от других процессов, прежде чем взять его из журнала
+SYNC_TIMEOUT = float(os.environ.get("QUIZ_SYNC_TIMEOUT", 1.0))
+# Журнал изменений игр для восстановления после перезапуска; пустая строка - не писать журнал
+JOURNAL_DIR = os.environ.get("QUIZ_JOURNAL_DIR", "journal")
+# always / interval / never
+JOURNAL_FSYNC = os.environ.get("QUIZ_JOURNAL_FSYNC", "interval")
+JOURNAL_FSYNC_INTERVAL = float(os.environ.get("QUIZ_JOURNAL_FSYNC_INTERVAL", 1.0))
+# Через столько записей журнал сжимается в снимок состояния игры
+JOURNAL_SNAPSHOT_EVERY = int(os.environ.get("QUIZ_JOURNAL_SNAPSHOT_EVERY", 500))
+# Изменения черновика ответа стола за это окно (секунды) уходят клиентам одной рассылкой; 0 - сразу
+NOTIFY_COALESCE_WINDOW = float(os.environ.get("QUIZ_NOTIFY_COALESCE_WINDOW", 0.05))
+# Очередь исходящих сообщений сокета: при переполнении или отставании дольше OUTBOX_MAX_LAG секунд сокет отключается
+OUTBOX_MAX_MESSAGES = int(os.environ.get("QUIZ_OUTBOX_MAX_MESSAGES", 64))
+OUTBOX_MAX_LAG = float(os.environ.get("QUIZ_OUTBOX_MAX_LAG", 10.0))
+# Как часто (секунды) замерять задержку и смещение часов телефонов и экранов; 0 - только при подключении
+PING_INTERVAL = float(os.environ.get("QUIZ_PING_INTERVAL", 15))
+# Когда время вопроса вышло: "1" - сразу показать ответы, иначе вопрос только закрывается для ответов
+TIMER_AUTO_SHOW_ANSWERS = os.environ.get("QUIZ_TIMER_AUTO_SHOW_ANSWERS", "0") == "1"
+# Папка с квизами (JSON, YAML, SQLite), имя квиза - имя файла; встроенный квиз из data/queststion_conf.py - "default"
+QUIZ_DIR = os.environ.get("QUIZ_QUIZ_DIR", "quizzes")
+# Квиз новых игр и игр после сброса без явного выбора
+DEFAULT_QUIZ = os.environ.get("QUIZ_DEFAULT_QUIZ", "default")
+# Сборка фронтенда: index.html и static/ (в том числе картинки квиза static/quiz)
+STATIC_DIR = os.environ.get("QUIZ_STATIC_DIR", "frontend/dist")
+# Сколько байт горячих файлов держать в памяти
+STATIC_CACHE_BYTES = int(os.environ.get("QUIZ_STATIC_CACHE_BYTES", 64 * 1024 * 1024))
+# max-age для файлов без хэша в имени (картинки квиза); файлы сборки с хэшем кэшируются навсегда
+STATIC_MAX_AGE = int(os.environ.get("QUIZ_STATIC_MAX_AGE", 300))
+# Уменьшенные копии картинок квиза для телефонов (нужен Pillow): ширины через запятую, формат и качество
+IMAGE_WIDTHS = tuple(int(w) for w in os.environ.get("QUIZ_IMAGE_WIDTHS", "480,960").split(",") if w.strip())
+IMAGE_FORMAT = os.environ.get("QUIZ_IMAGE_FORMAT", "webp")
+IMAGE_QUALITY = int(os.environ.get("QUIZ_IMAGE_QUALITY", 80))
+# Как часто (секунды) замерять задержку event loop для /metrics; 0 - не замерять
+METRICS_LOOP_LAG_INTERVAL = float(os.environ.get("QUIZ_METRICS_LOOP_LAG_INTERVAL", 0.5))
+# "1" - с запуска записывать профили шагов ведущего (data/profiler.py); включаются и командой from_admin_set_profiling
+PROFILE_TRANSITIONS = os.environ.get("QUIZ_PROFILE_TRANSITIONS", "0") == "1"
+# Логи (data/log.py): уровень, формат json или text, не больше QUIZ_LOG_RATE записей в секунду на событие
+# (с запасом QUIZ_LOG_BURST) и доля записей по событиям: "send_failed=0.1,close_failed=0.5"
+LOG_LEVEL = os.environ.get("QUIZ_LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("QUIZ_LOG_FORMAT", "json")
+LOG_RATE = float(os.environ.get("QUIZ_LOG_RATE", 10))
+LOG_BURST = float(os.environ.get("QUIZ_LOG_BURST", 20))
+LOG_SAMPLE = os.environ.get("QUIZ_LOG_SAMPLE", "")
+# Лимиты входящих событий столов (data/ratelimit.py): "событие=в секунду/запас" через запятую, "*" - остальные типы.
+# Сверх лимита сообщение отбрасывается без ответа. Лимит стола действует на события лидера и не сбрасывается
+# переподключением; после QUIZ_RATE_LIMIT_DISCONNECT отброшенных подряд сообщений сокет закрывается, 0 - не закрывать
+RATE_LIMIT_CONNECTION = os.environ.get(
+    "QUIZ_RATE_LIMIT_CONNECTION",
+    "from_set_table_answers=10/20,from_answer_question=2/5,from_set_table_name=1/5,from_resync=1/5,from_pong=2/5,"
+    "*=5/10",
+)
+RATE_LIMIT_TABLE = os.environ.get(
+    "QUIZ_RATE_LIMIT_TABLE", "from_set_table_answers=10/20,from_answer_question=2/5,from_set_table_name=1/5",
+)
+RATE_LIMIT_DISCONNECT = int(os.environ.get("QUIZ_RATE_LIMIT_DISCONNECT", 200))
+# Куда сохранить полные данные игры после подведения итогов; пустая строка - не сохранять
+GAME_STATE_PATH = os.environ.get("QUIZ_GAME_STATE_PATH", "game_state.json")
@@ -0,0 +1,210 @@
+import abc
+import asyncio
+import json
+import uuid
+from typing import Awaitable, Callable, List
+from urllib.parse import urlparse
+
+from data.log import get_logger
+
+log = get_logger(__name__)
+
+# (код игры, сообщение) -> применить изменение к локальной копии игры
+MessageHandler = Callable[[str, dict], Awaitable[None]]
+# Связь восстановлена после обрыва: изменения за это время потеряны, игры нужно синхронизировать
+ReconnectHandler = Callable[[], Awaitable[None]]
+
+
+class StateBackend(abc.ABC):
+    """Обмен изменениями состояния игр между процессами (воркерами uvicorn или узлами).
+
+    Каждый процесс держит свою копию игры и свои сокеты. Изменение применяется в процессе,
+    куда пришло событие, и публикуется, остальные процессы применяют его к своей копии
+    и рассылают своим сокетам.
+    """
+
+    def __init__(self):
+        self.worker_id = uuid.uuid4().hex[:12]
+
+    @property
+    def shared(self) -> bool:
+        """Есть ли кроме этого процесса другие, которым нужно рассылать изменения."""
+        return False
+
+    async def start(self, on_message: MessageHandler, on_reconnect: ReconnectHandler | None = None):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abc.abstractmethod
+    async def publish(self, game_code: str, message: dict):
+        ...
+
+
+class MemoryBackend(StateBackend):
+    """Всё состояние в одном процессе, рассылать некому."""
+
+    async def publish(self, game_code: str, message: dict):
+        pass
+
+
+class RedisBackend(StateBackend):
+    """Pub/sub через сервер с протоколом Redis (RESP2): PUBLISH / PSUBSCRIBE на каналы quiz:{код игры}."""
+
+    CHANNEL_PREFIX = "quiz:"
+    # Пауза перед повторным подключением после обрыва, секунды: удваивается до RECONNECT_MAX
+    RECONNECT_MIN = 0.5
+    RECONNECT_MAX = 10.0
+
+    def __init__(self, url: str):
+        super().__init__()
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self._pub: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._pub_lock = asyncio.Lock()
+        self._sub: tuple[asyncio.StreamReader, asyncio.StreamWriter] | None = None
+        self._listener: asyncio.Task | None = None
+
+    @property
+    def shared(self) -> bool:
+        return True
+
+    async def start(self, on_message: MessageHandler, on_reconnect: ReconnectHandler | None = None):
+        # Без сервера при запуске процесс не стартует; обрывы после запуска переживает _run
+        await self._open()
+        self._listener = asyncio.create_task(self._run(on_message, on_reconnect))
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        for connection in (self._pub, self._sub):
+            if connection:
+                connection[1].close()
+
+    async def publish(self, game_code: str, message: dict):
+        """Разослать изменение. Без связи с сервером оно теряется: после переподключения игры синхронизируются."""
+        payload = json.dumps({"worker": self.worker_id, **message}, separators=(",", ":"), ensure_ascii=False)
+        async with self._pub_lock:
+            if self._pub is None:
+                log.warning("publish_dropped", game=game_code, op=message.get("op"))
+                return
+            reader, writer = self._pub
+            try:
+                writer.write(encode_command("PUBLISH", self.CHANNEL_PREFIX + game_code, payload))
+                await writer.drain()
+                await read_reply(reader)
+            except (ConnectionError, OSError, asyncio.IncompleteReadError) as e:
+                # Изменение уже применено здесь; клиенту не ошибка, а переподключение через _run
+                log.warning("publish_failed", error=str(e), game=game_code, op=message.get("op"))
+                self._pub = None
+                writer.close()
+                if self._sub:
+                    self._sub[1].close()
+
+    async def _open(self):
+        """Подключиться заново: соединение для PUBLISH и подписка на каналы игр."""
+        pub = await self._connect()
+        reader, writer = await self._connect()
+        writer.write(encode_command("PSUBSCRIBE", self.CHANNEL_PREFIX + "*"))
+        await writer.drain()
+        await read_reply(reader)
+        self._pub, self._sub = pub, (reader, writer)
+
+    async def _run(self, on_message: MessageHandler, on_reconnect: ReconnectHandler | None):
+        delay = self.RECONNECT_MIN
+        while True:
+            try:
+                await self._listen(*self._sub, on_message)
+            except Exception as e:
+                log.warning("backend_disconnected", error=str(e))
+            if self._pub is not None:
+                self._pub[1].close()
+                self._pub = None
+            while True:
+                await asyncio.sleep(delay)
+                try:
+                    await self._open()
+                    break
+                except (ConnectionError, OSError, asyncio.IncompleteReadError, RuntimeError) as e:
+                    delay = min(delay * 2, self.RECONNECT_MAX)
+                    log.warning("backend_reconnect_failed", error=str(e), retry_in=delay)
+            delay = self.RECONNECT_MIN
+            log.info("backend_reconnected")
+            if on_reconnect is not None:
+                try:
+                    await on_reconnect()
+                except Exception as e:
+                    log.exception("backend_resync_failed", error=str(e))
+
+    async def _connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        if self.password:
+            writer.write(encode_command("AUTH", self.password))
+            await writer.drain()
+            await read_reply(reader)
+        return reader, writer
+
+    async def _listen(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, on_message: MessageHandler):
+        try:
+            while True:
+                reply = await read_reply(reader)
+                # ["pmessage", pattern, channel, data]
+                if not isinstance(reply, list) or reply[0] != b"pmessage":
+                    continue
+                message = json.loads(reply[3])
+                if message.get("worker") == self.worker_id:
+                    continue
+                game_code = reply[2].decode()[len(self.CHANNEL_PREFIX):]
+                try:
+                    await on_message(game_code, message)
+                except Exception as e:
+                    log.exception("remote_apply_failed", error=str(e), game=game_code, op=message.get("op"))
+        finally:
+            writer.close()
+
+
+def encode_command(*args: str) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        data = arg.encode() if isinstance(arg, str) else arg
+        parts.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("State backend connection closed")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        raise RuntimeError(rest.decode())
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        if length < 0:
+            return None
+        items: List = []
+        for _ in range(length):
+            items.append(await read_reply(reader))
+        return items
+    raise RuntimeError(f"Unexpected reply from state backend: {line!r}")
+
+
+def create_backend(url: str) -> StateBackend:
+    if url == "memory":
+        return MemoryBackend()
+    if url.startswith("redis://"):
+        return RedisBackend(url)
+    raise ValueError(f'Unknown state backend "{url}"')
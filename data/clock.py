@@ -0,0 +1,63 @@
+import time
+from collections import deque
+from typing import Dict, Tuple
+
+from data.question import ANSWER_GRACE
+
+# Минимальный запас на ответ после окончания таймера, даже при нулевой задержке сети
+ANSWER_GRACE_MIN = 0.5
+# Сколько ping без ответа помнить
+MAX_PENDING_PINGS = 4
+
+
+class ClockEstimator:
+    """Задержка (RTT) и смещение часов одного клиента по ping/pong.
+
+    Сервер отправляет ping с id и своим временем, клиент отвечает from_pong с тем же id и своим временем.
+    Смещение берётся из замера с наименьшим RTT: в нём меньше всего задержек в очередях.
+    """
+
+    def __init__(self, samples: int = 8):
+        self._next_id = 0
+        # id ping -> (time.monotonic(), time.time()) на момент отправки
+        self._pending: Dict[int, Tuple[float, float]] = {}
+        # Последние замеры: (RTT, смещение часов клиента относительно сервера), секунды
+        self.samples: deque[Tuple[float, float]] = deque(maxlen=samples)
+
+    def ping(self) -> Tuple[int, float]:
+        """Зарегистрировать новый ping, вернуть его id и время сервера."""
+        self._next_id += 1
+        if len(self._pending) >= MAX_PENDING_PINGS:
+            self._pending.pop(min(self._pending))
+        sent = (time.monotonic(), time.time())
+        self._pending[self._next_id] = sent
+        return self._next_id, sent[1]
+
+    def pong(self, ping_id: int, client_time: float) -> bool:
+        """Учесть ответ клиента. False, если такого ping не было."""
+        sent = self._pending.pop(ping_id, None)
+        if sent is None:
+            return False
+        rtt = time.monotonic() - sent[0]
+        # Клиент отвечал примерно через половину RTT после отправки
+        self.samples.append((rtt, client_time - (sent[1] + rtt / 2)))
+        return True
+
+    @property
+    def rtt(self) -> float | None:
+        if not self.samples:
+            return None
+        return min(rtt for rtt, _ in self.samples)
+
+    @property
+    def offset(self) -> float | None:
+        if not self.samples:
+            return None
+        return min(self.samples)[1]
+
+    def grace(self) -> float:
+        """Сколько секунд после окончания таймера принимать ответ этого клиента."""
+        if not self.samples:
+            return ANSWER_GRACE
+        # Ответ идёт до сервера половину RTT; худший из последних замеров покрывает и разброс задержки
+        return min(ANSWER_GRACE_MIN + max(rtt for rtt, _ in self.samples), ANSWER_GRACE)
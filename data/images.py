@@ -0,0 +1,99 @@
+"""Уменьшенные копии картинок квиза для телефонов.
+
+Копии создаются при загрузке квиза и лежат на диске под именем из хэша содержимого, поэтому после
+перезапуска или правки квиза заново сжимаются только новые картинки. Заранее собрать копии для всех квизов:
+    python -m data.images
+"""
+import hashlib
+import os
+import threading
+from typing import Dict, Tuple
+
+from config import STATIC_DIR, IMAGE_WIDTHS, IMAGE_FORMAT, IMAGE_QUALITY
+from data.log import get_logger
+
+try:
+    from PIL import Image, features
+except ImportError:  # без Pillow отдаются только исходные картинки
+    Image = None
+    features = None
+
+log = get_logger(__name__)
+
+STATIC_URL = "/static/"
+# Папка копий внутри static сборки, чтобы их раздавал тот же StaticAssets
+DERIVED_DIR = "_derived"
+
+
+class ImageDerivatives:
+    def __init__(self, static_dir: str, widths: Tuple[int, ...] = (480, 960), image_format: str = "webp",
+                 quality: int = 80):
+        self.static_dir = os.path.join(static_dir, "static")
+        self.output_dir = os.path.join(self.static_dir, DERIVED_DIR)
+        self.widths = tuple(sorted(widths))
+        self.image_format = image_format
+        self.quality = quality
+        # url -> (mtime исходника, srcset)
+        self._srcsets: Dict[str, Tuple[float, str | None]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return Image is not None and bool(self.widths) and features.check(self.image_format)
+
+    def srcset(self, url: str) -> str | None:
+        """srcset для картинки квиза: уменьшенные копии и исходник с их ширинами; None - копий нет."""
+        if not self.enabled or not url.startswith(STATIC_URL):
+            return None
+        path = os.path.join(self.static_dir, url[len(STATIC_URL):])
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        cached = self._srcsets.get(url)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            srcset = self._build(url, path)
+        except OSError as e:
+            log.warning("image_resize_failed", url=url, error=str(e))
+            srcset = None
+        self._srcsets[url] = (mtime, srcset)
+        return srcset
+
+    def _build(self, url: str, path: str) -> str | None:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        with Image.open(path) as image:
+            width, height = image.size
+            entries = []
+            for target in self.widths:
+                if target >= width:
+                    break
+                name = f"{digest}-{target}.{self.image_format}"
+                output = os.path.join(self.output_dir, name)
+                if not os.path.exists(output):
+                    os.makedirs(self.output_dir, exist_ok=True)
+                    resized = image.convert("RGB").resize((target, round(height * target / width)), Image.LANCZOS)
+                    # Запись через временный файл: параллельный воркер (или поток загрузки квиза) не увидит
+                    # недописанную картинку
+                    tmp_output = f"{output}.{os.getpid()}.{threading.get_ident()}.tmp"
+                    resized.save(tmp_output, self.image_format.upper(), quality=self.quality)
+                    os.replace(tmp_output, output)
+                entries.append(f"{STATIC_URL}{DERIVED_DIR}/{name} {target}w")
+        if not entries:
+            return None
+        # Исходник остаётся самым крупным вариантом для главного экрана
+        return ", ".join(entries + [f"{url} {width}w"])
+
+
+images = ImageDerivatives(STATIC_DIR, IMAGE_WIDTHS, IMAGE_FORMAT, IMAGE_QUALITY)
+
+
+if __name__ == "__main__":
+    from data.quiz import quizzes
+
+    if not images.enabled:
+        print(f"Pillow with {IMAGE_FORMAT} support is required")
+    for name in quizzes.names():
+        quiz = quizzes.get(name)
+        print(f"{name}: {sum(1 for q in quiz.questions for s in q.images_srcset + q.answer_images_srcset if s)} images")
@@ -0,0 +1,239 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import List, Tuple
+
+from data import wire
+from data.log import get_logger
+
+try:
+    import fcntl
+except ImportError:  # без fcntl (Windows) писателя журнала не выбрать: журнал пишет каждый процесс
+    fcntl = None
+
+log = get_logger(__name__)
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class JournalWriter:
+    """Фоновый поток, который пишет журналы и снимки всех игр процесса пачками, не блокируя event loop.
+
+    fsync: "always" - после каждой пачки, "interval" - не чаще раза в fsync_interval секунд, "never" - на усмотрение ОС.
+    """
+
+    def __init__(self, fsync: str = "interval", fsync_interval: float = 1.0, batch_size: int = 512):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f'Unknown fsync policy "{fsync}"')
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+        self._last_fsync = time.monotonic()
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Дописать всё, что в очереди, и остановить поток."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def submit(self, item: tuple):
+        self._queue.put_nowait(item)
+
+    def _run(self):
+        # Журналы с записями, которые ещё не прошли fsync: переходят из пачки в пачку до fsync по интервалу
+        dirty = set()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self._fsync_wait(dirty))]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            written = set()
+            for item in batch:
+                if item is None:
+                    self._sync(dirty | written, force=True)
+                    for journal in dirty | written:
+                        journal.close_file()
+                    return
+                kind, journal, payload = item
+                try:
+                    if kind == "entry":
+                        journal.write_line(payload)
+                        written.add(journal)
+                    elif kind == "snapshot":
+                        # Снимок включает все записи до него, журнал после этого начинается заново
+                        journal.write_snapshot(payload)
+                        written.discard(journal)
+                        dirty.discard(journal)
+                    elif kind == "close":
+                        self._sync({journal}, force=True)
+                        journal.close_file()
+                        journal.release()
+                        written.discard(journal)
+                        dirty.discard(journal)
+                except OSError as e:
+                    log.error("journal_write_failed", game=journal.code, error=str(e))
+            for journal in written:
+                journal.flush()
+            if self.fsync != "never":
+                dirty |= written
+            if dirty and self._sync(dirty):
+                dirty.clear()
+
+    def _fsync_wait(self, dirty: set) -> float | None:
+        """Сколько ждать следующую запись: при fsync по интервалу - не дольше, чем до fsync записанного."""
+        if not dirty or self.fsync != "interval":
+            return None
+        return max(self._last_fsync + self.fsync_interval - time.monotonic(), 0)
+
+    def _sync(self, journals: set, force: bool = False) -> bool:
+        """fsync журналов, если пора по политике; True - fsync выполнен."""
+        for journal in journals:
+            journal.flush()
+        if self.fsync == "never" and not force:
+            return False
+        now = time.monotonic()
+        if self.fsync == "interval" and not force and now - self._last_fsync < self.fsync_interval:
+            return False
+        self._last_fsync = now
+        for journal in journals:
+            journal.fsync()
+        return True
+
+
+class Journal:
+    """Журнал изменений одной игры (по строке JSON на изменение) и её последний снимок.
+
+    Записи формируются на event loop, на диск их пишет JournalWriter. Файлы игры общие для всех процессов
+    (воркеров uvicorn), пишет их один - тот, кто держит блокировку {code}.lock (acquire); он записывает
+    и изменения, пришедшие от других процессов. Остальные процессы только пробуют сменить писателя.
+    """
+
+    # Как часто процесс, который не пишет журнал, пробует стать писателем, секунды
+    LOCK_RETRY = 1.0
+
+    def __init__(self, writer: JournalWriter, directory: str, code: str, snapshot_every: int = 500):
+        os.makedirs(directory, exist_ok=True)
+        self.writer = writer
+        self.code = code
+        self.path = os.path.join(directory, f"{code}.journal")
+        self.snapshot_path = os.path.join(directory, f"{code}.snapshot.json")
+        self.lock_path = os.path.join(directory, f"{code}.lock")
+        self.snapshot_every = snapshot_every
+        self.seq = 0
+        # Этот процесс - писатель журнала игры
+        self.owner = False
+        self._since_snapshot = 0
+        self._file = None
+        self._lock_file = None
+        self._lock_tried = float("-inf")
+
+    def acquire(self) -> bool:
+        """Стать писателем журнала, если его не держит другой процесс. True - только что стал.
+
+        Журнал предыдущего писателя мог отстать, поэтому новый писатель начинает со снимка.
+        """
+        if self.owner:
+            return False
+        now = time.monotonic()
+        if now - self._lock_tried < self.LOCK_RETRY:
+            return False
+        self._lock_tried = now
+        if fcntl is not None:
+            if self._lock_file is None:
+                self._lock_file = open(self.lock_path, "a")
+            try:
+                # Блокировку снимает и ОС, если процесс писателя упал
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                return False
+        self.owner = True
+        return True
+
+    def record(self, op: str, args: dict):
+        self.seq += 1
+        self._since_snapshot += 1
+        line = wire.dumps({"seq": self.seq, "ts": time.time(), "op": op, **args})
+        self.writer.submit(("entry", self, line))
+
+    def snapshot_due(self) -> bool:
+        return self._since_snapshot >= self.snapshot_every
+
+    def snapshot(self, data: dict):
+        """Сохранить полное состояние игры и начать журнал заново. data не должна меняться после вызова."""
+        self._since_snapshot = 0
+        self.writer.submit(("snapshot", self, {"seq": self.seq, "ts": time.time(), "data": data}))
+
+    def close(self):
+        """Дописать журнал и отдать его другим процессам."""
+        self.owner = False
+        self.writer.submit(("close", self, None))
+
+    def load(self) -> Tuple[dict | None, List[dict]]:
+        """Прочитать снимок и записи журнала после него."""
+        snapshot = None
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        after = snapshot["seq"] if snapshot else 0
+
+        entries = []
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Последняя строка могла не дописаться при падении
+                        break
+                    if entry["seq"] > after:
+                        entries.append(entry)
+
+        self.seq = entries[-1]["seq"] if entries else after
+        return snapshot, entries
+
+    # Методы ниже вызываются только из потока JournalWriter
+
+    def write_line(self, line: str):
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(line + "\n")
+
+    def write_snapshot(self, snapshot: dict):
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(wire.dumps(snapshot))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        self.close_file()
+        self._file = open(self.path, "w", encoding="utf-8")
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def fsync(self):
+        if self._file is not None:
+            os.fsync(self._file.fileno())
+
+    def close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
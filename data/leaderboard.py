@@ -0,0 +1,46 @@
+from typing import Callable, Dict, Iterable, List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from data.obj import Table
+
+
+class Leaderboard:
+    """Места столов в общем зачёте и по категориям. Считается один раз при подведении итогов."""
+
+    def __init__(self, tables: Iterable['Table'], categories: Iterable[str]):
+        tables = list(tables)
+        self.place_amount = len(tables)
+
+        overall = self._rank(tables, key=lambda t: t.result.score)
+        self.places: Dict[int, int] = dict(overall)
+        self.winners: List[int] = [table_id for table_id, _ in overall[:3]]
+
+        self.category_places: Dict[str, Dict[int, int]] = {}
+        self.category_winners: Dict[str, int | None] = {}
+        for category in categories:
+            ranked = self._rank(tables, key=lambda t: (t.result.categories.get(category, 0), t.result.score))
+            self.category_places[category] = dict(ranked)
+            # Победителем категории может быть только стол, который отвечал на её вопросы
+            answered = {t.id for t in tables if category in t.result.categories}
+            self.category_winners[category] = next((tid for tid, _ in ranked if tid in answered), None)
+
+        # Столы, которые показываются на экране итогов: общие победители и победители категорий
+        self.featured = set(self.winners) | {tid for tid in self.category_winners.values() if tid is not None}
+
+    @staticmethod
+    def _rank(tables: List['Table'], key: Callable) -> List[Tuple[int, int]]:
+        """Отсортировать столы и выдать места, одинаковые значения делят место (1, 2, 2, 4)."""
+        keyed = sorted(((key(t), t.id) for t in tables), key=lambda x: x[0], reverse=True)
+        ranked = []
+        place, previous = 0, None
+        for position, (value, table_id) in enumerate(keyed, start=1):
+            if value != previous:
+                place, previous = position, value
+            ranked.append((table_id, place))
+        return ranked
+
+    def get_place(self, table_id: int) -> int | None:
+        return self.places.get(table_id)
+
+    def get_place_categories(self, table_id: int) -> Dict[str, int | None]:
+        return {category: places.get(table_id) for category, places in self.category_places.items()}
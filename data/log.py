@@ -0,0 +1,169 @@
+"""Структурные логи: запись - событие (короткий ключ, например send_failed) и поля.
+
+Запись проходит фильтр в вызывающем коде и кладётся в очередь; форматирует и пишет её фоновый поток
+(QueueListener), поэтому массовое отключение телефонов не пишет в stdout синхронно из event loop.
+Фильтр ограничивает частоту записей одного события (token bucket) и может оставлять только долю
+записей (сэмплирование); сколько записей пропущено, видно в поле suppressed следующей записи события.
+
+Поля контекста (игра, стол, роль, тип события) берутся из контекста подключения: new_context при создании
+клиента, дальше клиент меняет возвращённый словарь на месте. Задачи, созданные из подключения (очередь
+сокета), видят тот же словарь.
+"""
+import json
+import logging
+import queue
+import random
+import time
+from contextvars import ContextVar
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, List
+
+LOGGER_NAME = "quiz"
+
+_context: ContextVar[Dict | None] = ContextVar("log_context", default=None)
+
+
+def new_context(**fields) -> dict:
+    """Начать контекст подключения; возвращённый словарь можно менять и потом."""
+    context = {key: value for key, value in fields.items() if value is not None}
+    _context.set(context)
+    return context
+
+
+class StructLogger:
+    """logging.Logger с полями записи именованными аргументами: log.warning("send_failed", error=str(e))."""
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(name)
+
+    def _log(self, level: int, event: str, exc_info: bool, fields: dict):
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, **fields):
+        self._log(logging.DEBUG, event, False, fields)
+
+    def info(self, event: str, **fields):
+        self._log(logging.INFO, event, False, fields)
+
+    def warning(self, event: str, **fields):
+        self._log(logging.WARNING, event, False, fields)
+
+    def error(self, event: str, **fields):
+        self._log(logging.ERROR, event, False, fields)
+
+    def exception(self, event: str, **fields):
+        self._log(logging.ERROR, event, True, fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(f"{LOGGER_NAME}.{name}")
+
+
+class RateLimitFilter(logging.Filter):
+    """Не больше rate записей в секунду (с запасом burst) на событие и доля sample[событие] от них."""
+
+    def __init__(self, rate: float = 10.0, burst: float = 20.0, sample: Dict[str, float] | None = None):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.sample = sample or {}
+        # событие -> [токены, время пополнения, пропущено записей]
+        self._buckets: Dict[str, List[float]] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        event = record.msg
+        bucket = self._buckets.get(event)
+        now = time.monotonic()
+        if bucket is None:
+            bucket = self._buckets[event] = [self.burst, now, 0]
+        # Ошибки уровня ERROR не сэмплируются, но тоже ограничены по частоте
+        ratio = self.sample.get(event, 1.0) if record.levelno < logging.ERROR else 1.0
+        if self.rate > 0:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if (self.rate > 0 and bucket[0] < 1) or (ratio < 1.0 and random.random() >= ratio):
+            bucket[2] += 1
+            return False
+        if self.rate > 0:
+            bucket[0] -= 1
+
+        fields = dict(_context.get() or {})
+        fields.update(getattr(record, "fields", None) or {})
+        if bucket[2]:
+            fields["suppressed"] = int(bucket[2])
+            bucket[2] = 0
+        if ratio < 1.0:
+            fields["sample"] = ratio
+        record.fields = fields
+        return True
+
+
+class _QueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Трассировка форматируется здесь: exc_info нельзя передать в другой поток
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.msg,
+            **getattr(record, "fields", {}),
+        }
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Строка в стиле logfmt: время, уровень, событие и поля key=value."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = "%s %s %s %s" % (
+            self.formatTime(record), record.levelname, record.name, record.msg,
+        )
+        fields = getattr(record, "fields", {})
+        if fields:
+            line += " " + " ".join(f"{key}={json.dumps(value, ensure_ascii=False, default=str)}"
+                                   for key, value in fields.items())
+        if record.exc_text:
+            line += "\n" + record.exc_text
+        return line
+
+
+def parse_sample(value: str) -> Dict[str, float]:
+    """"send_failed=0.1,close_failed=0.5" -> доли записей по событиям."""
+    sample = {}
+    for item in value.split(","):
+        if "=" in item:
+            event, ratio = item.split("=", 1)
+            sample[event.strip()] = float(ratio)
+    return sample
+
+
+def setup(level: str = "INFO", log_format: str = "json", rate: float = 10.0, burst: float = 20.0,
+          sample: Dict[str, float] | None = None) -> QueueListener:
+    """Направить логи quiz.* в очередь с фоновым потоком-писателем. Поток останавливается listener.stop()."""
+    stream = logging.StreamHandler()
+    stream.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(RateLimitFilter(rate, burst, sample))
+
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.setLevel(level.upper())
+    logger.handlers = [handler]
+    logger.propagate = False
+
+    listener = QueueListener(records, stream, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -0,0 +1,220 @@
+"""Метрики процесса в текстовом формате Prometheus (GET /metrics).
+
+Замер на горячем пути - perf_counter, поиск корзины bisect и пара сложений, поэтому метрики включены всегда.
+То, что сервер и так знает (подключения, отправленные байты из wire.stats), собирается только при запросе.
+"""
+import asyncio
+import bisect
+import time
+from typing import Dict, List, Tuple
+
+from data import wire
+from data.table.events import FromClientEventTypes, FromAdminEventTypes
+
+# Секунды: от долей миллисекунды (обработчик, сериализация) до секунд (рассылка на медленные телефоны)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+# Типы входящих событий, которые попадают в метки как есть; остальные (ошибки клиентов) - "unknown"
+EVENT_TYPES = frozenset(
+    value for cls in (FromClientEventTypes, FromAdminEventTypes)
+    for name, value in vars(cls).items() if not name.startswith("_")
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._children: Dict[Tuple, object] = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+    def _render_child(self, values: Tuple, child) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, values)} {child.value}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # counts[i] - наблюдений в корзине i (не накопительно), последняя - выше всех границ
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _render_child(self, values: Tuple, child: _HistogramValue) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = 'le="%s"' % ("+Inf" if bound == float("inf") else repr(bound))
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {child.sum}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {child.count}")
+        return lines
+
+
+MESSAGES_RECEIVED = Counter(
+    "quiz_messages_received_total", "Messages received from clients by endpoint and event type.",
+    ("endpoint", "event_type"),
+)
+HANDLER_SECONDS = Histogram(
+    "quiz_handler_seconds", "Time spent in ws_handler by endpoint and event type.", ("endpoint", "event_type"),
+)
+BROADCAST_SECONDS = Histogram(
+    "quiz_broadcast_seconds", "Time to serialize and queue a state broadcast (notify_clients, notify_screens).",
+    ("broadcast",),
+)
+SERIALIZE_SECONDS = Histogram(
+    "quiz_serialize_seconds", "Time to build, diff and serialize a table or screen state.", ("state",),
+)
+OUTBOX_DELAY_SECONDS = Histogram(
+    "quiz_outbox_delay_seconds", "Time from queueing a message in a socket outbox until it is sent.",
+)
+LOOP_LAG_SECONDS = Histogram(
+    "quiz_event_loop_lag_seconds", "How late the event loop wakes up a sleeping task.",
+)
+MESSAGES_DROPPED = Counter(
+    "quiz_messages_dropped_total", "Messages dropped before handling by endpoint, event type and reason.",
+    ("endpoint", "event_type", "reason"),
+)
+
+
+class handler_timer:
+    """Засечь обработку входящего кадра: with handler_timer("table", frame): await client.ws_handler(frame)."""
+
+    __slots__ = ("endpoint", "event_type", "start")
+
+    def __init__(self, endpoint: str, frame: str | bytes):
+        self.endpoint = endpoint
+        # Тип из начала кадра, до разбора: обработка включает и проверку события
+        event_type = wire.event_type(frame)
+        self.event_type = event_type if event_type in EVENT_TYPES else "unknown"
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        key = (self.endpoint, self.event_type)
+        MESSAGES_RECEIVED.labels(*key).inc()
+        HANDLER_SECONDS.labels(*key).observe(time.perf_counter() - self.start)
+        return False
+
+
+def count_dropped(endpoint: str, event_type: str, reason: str):
+    """Отброшенное сообщение: reason - connection / table (лимит частоты) или mismatch (тип не совпал)."""
+    MESSAGES_DROPPED.labels(endpoint, event_type if event_type in EVENT_TYPES else "unknown", reason).inc()
+
+
+async def run_loop_lag(interval: float):
+    """Замерять, насколько позже заказанного просыпается задача: это и есть задержка всех сокетов."""
+    observe = LOOP_LAG_SECONDS.labels().observe
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        observe(max(time.perf_counter() - start - interval, 0.0))
+
+
+def _connections(games: Dict) -> List[str]:
+    lines = [
+        "# HELP quiz_connected_sockets Websockets connected to this process by game, kind and table.",
+        "# TYPE quiz_connected_sockets gauge",
+    ]
+    names = ("game", "kind", "table")
+    for code, game in sorted(games.items()):
+        for table_id, table in sorted(game.tables.items()):
+            # Только сокеты этого процесса: метрики воркеров складываются при запросе к Prometheus
+            count = len(table.observers) + (1 if table.leader else 0)
+            if count:
+                lines.append(f"quiz_connected_sockets{_labels(names, (code, 'table', table_id))} {count}")
+        lines.append(f"quiz_connected_sockets{_labels(names, (code, 'screen', ''))} {len(game.screens)}")
+        lines.append(f"quiz_connected_sockets{_labels(names, (code, 'admin', ''))} {len(game.admins)}")
+    return lines
+
+
+def _sent() -> List[str]:
+    lines = []
+    counters = wire.stats.snapshot()
+    for metric, key, documentation in (
+            ("quiz_messages_sent_total", "messages", "Messages sent to clients by event type."),
+            ("quiz_sent_bytes_total", "bytes", "Bytes of sent messages by event type, before permessage-deflate."),
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} counter"]
+        lines += [f"{metric}{_labels(('event_type',), (kind,))} {values[key]}" for kind, values in counters.items()]
+    return lines
+
+
+METRICS = (
+    MESSAGES_RECEIVED, HANDLER_SECONDS, BROADCAST_SECONDS, SERIALIZE_SECONDS, OUTBOX_DELAY_SECONDS, LOOP_LAG_SECONDS,
+    MESSAGES_DROPPED,
+)
+
+
+def render(games: Dict) -> str:
+    """Все метрики; games - код игры -> Game (GameRegistry.games)."""
+    lines = _connections(games) + _sent()
+    for metric in METRICS:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
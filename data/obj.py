@@ -1,94 +1,239 @@
 import abc
 import asyncio
 import json
-from typing import List, Dict, Callable, Literal
+import time
+from typing import List, Dict, Callable, Iterable, Tuple
 
 from fastapi import WebSocket
-from starlette.websockets import WebSocketState
-
-from data.question import QuestionManager, Result
-from data.table.events import TableEvent, FromSetTableNameEvent, ErrorEvent, FromClientEventTypes, FromAdminEventTypes, \
+from pydantic import ValidationError
+from starlette.websockets import WebSocketState, WebSocketDisconnect
+
+from config import DEFAULT_GAME, NOTIFY_COALESCE_WINDOW, OUTBOX_MAX_MESSAGES, OUTBOX_MAX_LAG, GAME_STATE_PATH, \
+    TIMER_AUTO_SHOW_ANSWERS, PROFILE_TRANSITIONS, RATE_LIMIT_CONNECTION, RATE_LIMIT_TABLE, RATE_LIMIT_DISCONNECT
+from data import wire, profiler
+from data.backend import StateBackend, MemoryBackend
+from data.clock import ClockEstimator
+from data.journal import Journal
+from data.leaderboard import Leaderboard
+from data.log import get_logger, new_context
+from data.metrics import SERIALIZE_SECONDS, BROADCAST_SECONDS, count_dropped
+from data.outbox import Outbox
+from data.patch import make_patch, PROTOCOL_PATCH
+from data.profiler import Profiler, span
+from data.question import QuestionManager, QuestionObject, Result, ANSWER_GRACE
+from data.quiz import quizzes
+from data.ratelimit import RateLimiter, parse_limits
+from data.router import EventRouter, describe_error
+from data.table.events import TableEvent, FromSetTableNameEvent, ErrorEvent, FromAdminEventTypes, \
     FromAnswerQuestionEvent, FromSetTableAnswersEvent, FromAdminChangeLeaderEvent, ScreenTablesStateEvent, TableData, \
-    ScreenTableAnsweredEvent, ResizeTablesEvent
+    ScreenTableAnsweredEvent, ResizeTablesEvent, TablePatchEvent, ScreenPatchEvent, TimerEvent, FromAdminExtendTimerEvent, \
+    PingEvent, ClockEvent, FromPongEvent, FromAdminResetGameEvent, FromAdminSetProfilingEvent, ProfilesEvent, \
+    FromResyncEvent, FromAdminStartGameEvent, FromAdminShowAnswersEvent, FromAdminPreviousQuestionEvent, \
+    FromAdminNextQuestionEvent, FromAdminResultsEvent, FromAdminPauseTimerEvent, FromAdminResumeTimerEvent, \
+    FromAdminGetProfilesEvent, FromAdminNextStepEvent
 from data.table.models import TableState, ClientRole, GameState, TableResult, ScreenResults, ToTableResult
 
 
+# Изменения, которые пишутся в журнал игры: ответы, названия столов и переходы ведущего
+JOURNAL_OPS = {
+    "set_name", "set_answers", "answer",
+    "start", "show_answers", "previous_question", "next_question", "show_results", "reset", "resize", "timer",
+}
+# Шаги ведущего, которые рассылают состояние всем сразу: для них пишется профиль (Game.profiler)
+PROFILED_ADMIN_EVENTS = {
+    FromAdminEventTypes.from_admin_start_game, FromAdminEventTypes.from_admin_show_answers,
+    FromAdminEventTypes.from_admin_previous_question, FromAdminEventTypes.from_admin_next_question,
+    FromAdminEventTypes.from_admin_show_results, FromAdminEventTypes.from_admin_reset_game,
+    FromAdminEventTypes.from_admin_next_step,
+}
+
+
+log = get_logger(__name__)
+
+CONNECTION_LIMITS = parse_limits(RATE_LIMIT_CONNECTION)
+TABLE_LIMITS = parse_limits(RATE_LIMIT_TABLE)
+
+
+def _write_json(path: str, data: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
 class Client(abc.ABC):
-    def __init__(self, table: 'Table', connection: WebSocket, role: ClientRole = ClientRole.observer):
+    # Входящие события телефонов стола: обработчики отмечены @router.on
+    router = EventRouter()
+
+    def __init__(
+            self,
+            table: 'Table',
+            connection: WebSocket,
+            role: ClientRole = ClientRole.observer,
+            protocol: int = 1,
+            encoding: str = wire.ENCODING_JSON,
+    ):
         self.table: 'Table' = table
         self.connection = connection
-        self.role: ClientRole = role
+        # Поля логов этого подключения, общие с задачей-писателем его очереди
+        self.log_context = new_context(game=table.game.code, table=table.id)
+        self.role = role
+        self.protocol = protocol
+        # Формат состояния и патчей: JSON-текст или MessagePack (подпротокол wire.SUBPROTOCOL_MSGPACK)
+        self.encoding = encoding
+        # Версия состояния стола, которая есть у клиента (протокол с патчами)
+        self.version = -1
+        self.outbox = Outbox(connection, self.disconnect, OUTBOX_MAX_MESSAGES, OUTBOX_MAX_LAG)
+        self.clock = ClockEstimator()
+        self.limiter = RateLimiter(CONNECTION_LIMITS)
+        # Отброшенных подряд сообщений
+        self.dropped = 0
+
+    @property
+    def role(self) -> ClientRole:
+        return self._role
+
+    @role.setter
+    def role(self, role: ClientRole):
+        if getattr(self, "_role", None) != role:
+            if role == ClientRole.leader:
+                # Когда стал лидером (time.time()): из лидеров, назначенных одновременно в разных процессах,
+                # остаётся более ранний
+                self.leader_since = time.time()
+            # Роль есть только в полном состоянии, не в патчах: после смены роли клиенту нужно полное
+            self.version = -1
+        self._role = role
+        self.log_context["role"] = role.value
+
+    async def send_table_event(self, body: str | None = None, patch: str | None = None):
+        """Отправить состояние стола.
+
+        body - сериализованное событие без role, patch - сериализованный патч к предыдущей версии.
+        Без body отправляется полное текущее состояние.
+        """
+        table = self.table
+        if body is None:
+            table.commit_state()
+            body, patch = table.state_body, None
+        packed = self.encoding == wire.ENCODING_MSGPACK
+        if self.protocol < PROTOCOL_PATCH:
+            frame = table.packed_state(self.role) if packed else wire.with_role(body, self.role)
+        elif self.version == table.version:
+            return
+        elif patch is not None and self.version == table.version - 1 and not self.outbox.state_pending:
+            frame = table.packed_patch() if packed else patch
+        else:
+            # Неотправленное состояние заменяется, поэтому вместо патча к нему нужно полное состояние
+            if packed:
+                frame = table.packed_state(self.role, versioned=True)
+            else:
+                frame = wire.with_role(wire.with_version(body, table.version), self.role)
+        self.version = table.version
+        self.outbox.put_state(frame)
 
-    async def send_table_event(self):
-        question = self.table.game.question_manager.current_question
-        if question:
-            question = question.get_model()
-        data = TableEvent(
-            table_id=self.table.id,
-            role=self.role,
-            clients=len(self.table.observers) + 1,
-            table_state=self.table.state,
-            table_name=self.table.name,
-            question=question,
-            table_answers=self.table.table_answers,
-            answered=self.table.answered,
-            result=self.table.get_to_table_result(),
-        ).model_dump(mode="json")
+    async def send_error(self, error: str):
+        self.outbox.put_event(wire.dumps_model(ErrorEvent(error=error)))
+
+    def send_ping(self):
+        ping_id, server_time = self.clock.ping()
+        self.outbox.put_event(wire.dumps_model(PingEvent(id=ping_id, server_time=server_time)))
+
+    async def disconnect(self):
+        """Отключить клиента, который не успевает получать сообщения."""
+        self.outbox.stop()
+        await self.table.remove_client(self)
         try:
-            await self.connection.send_json(data)
+            await self.connection.close()
         except Exception as e:
-            print(f"Error sending table event: {e}")
-            await self.table.remove_client(self)
-            try:
-                await self.connection.close()
-            except Exception as e:
-                print(f"Error closing connection: {e}")
-
-    async def handle_set_table_name(self, event_data: dict):
-        event = FromSetTableNameEvent(**event_data)
+            log.warning("close_failed", error=str(e), **self.log_context)
+
+    @router.on(FromSetTableNameEvent)
+    async def handle_set_table_name(self, event: FromSetTableNameEvent):
         if self.role != ClientRole.leader:
-            await self.connection.send_json(ErrorEvent(error="Not allowed to set table name").model_dump(mode='json'))
+            await self.send_error("Not allowed to set table name")
             return
         try:
             await self.table.set_name(event.table_name)
         except Exception as e:
-            await self.connection.send_json(ErrorEvent(error=str(e)).model_dump(mode='json'))
+            await self.send_error(str(e))
             return
 
-    async def handle_set_table_answers(self, event_data: dict):
-        event = FromSetTableAnswersEvent(**event_data)
+    @router.on(FromSetTableAnswersEvent)
+    async def handle_set_table_answers(self, event: FromSetTableAnswersEvent):
         if self.role != ClientRole.leader:
-            await self.connection.send_json(ErrorEvent(error="Not allowed to set answers").model_dump(mode='json'))
+            await self.send_error("Not allowed to set answers")
             return
         try:
-            await self.table.set_table_answers(event.table_answers)
+            await self.table.set_table_answers(event.table_answers, grace=self.clock.grace())
         except Exception as e:
-            await self.connection.send_json(ErrorEvent(error=str(e)).model_dump(mode='json'))
+            await self.send_error(str(e))
             return
 
-    async def handle_answer_question(self, event_data: dict):
-        event = FromAnswerQuestionEvent(**event_data)
+    @router.on(FromAnswerQuestionEvent)
+    async def handle_answer_question(self, event: FromAnswerQuestionEvent):
         if self.role != ClientRole.leader:
-            await self.connection.send_json(ErrorEvent(error="Not allowed to answer question").model_dump(mode='json'))
+            await self.send_error("Not allowed to answer question")
         try:
-            await self.table.answer_question(event.table_answers)
+            await self.table.answer_question(event.table_answers, grace=self.clock.grace())
         except Exception as e:
-            await self.connection.send_json(ErrorEvent(error=str(e)).model_dump(mode='json'))
+            await self.send_error(str(e))
             return
 
-    async def ws_handler(self, event_data: dict):
-        event_type = event_data.get("event_type")
-        handlers: Dict[Literal, Callable] = {
-            FromClientEventTypes.from_set_table_name: self.handle_set_table_name,
-            FromClientEventTypes.from_set_table_answers: self.handle_set_table_answers,
-            FromClientEventTypes.from_answer_question: self.handle_answer_question,
-        }
-        handler = handlers.get(event_type)
-        if handler:
-            await handler(event_data)
-        else:
-            await self.connection.send_json(
-                ErrorEvent(error=f'Unknown event type "{event_type}"').model_dump(mode='json'))
+    @router.on(FromResyncEvent)
+    async def handle_resync(self, event: FromResyncEvent):
+        self.version = -1
+        await self.send_table_event()
+
+    @router.on(FromPongEvent)
+    async def handle_pong(self, event: FromPongEvent):
+        if self.clock.pong(event.id, event.client_time):
+            self.outbox.put_event(wire.dumps_model(
+                ClockEvent(offset=self.clock.offset, rtt=self.clock.rtt)
+            ))
+
+    async def _drop(self, event_type: str, reason: str):
+        """Отбросить сообщение без ответа: ответ на каждое лишнее сообщение - та же нагрузка."""
+        count_dropped("table", event_type, reason)
+        self.dropped += 1
+        log.debug("message_dropped", event_type=event_type, reason=reason)
+        if RATE_LIMIT_DISCONNECT and self.dropped >= RATE_LIMIT_DISCONNECT:
+            log.warning("rate_limit_disconnect", dropped=self.dropped)
+            await self.connection.close(code=1008)
+            # Цикл сокета удалит клиента со стола, как при обычном отключении
+            raise WebSocketDisconnect(1008)
+
+    async def _over_limit(self, event_type: str) -> bool:
+        """Проверить лимиты подключения и (для лидера) стола, отбросив сообщение сверх них."""
+        if not self.limiter.allow(event_type):
+            await self._drop(event_type, "connection")
+            return True
+        if self.role == ClientRole.leader and not self.table.limiter.allow(event_type):
+            await self._drop(event_type, "table")
+            return True
+        return False
+
+    async def ws_handler(self, frame: str | bytes | dict):
+        # Тип из кадра до разбора: сообщения сверх лимита не проверяются и не разбираются
+        event_type = frame.get("event_type") if isinstance(frame, dict) else wire.event_type(frame)
+        if not isinstance(event_type, str):
+            event_type = "unknown"
+        if await self._over_limit(event_type):
+            return
+        try:
+            event = self.router.decode(frame, binary=self.encoding == wire.ENCODING_MSGPACK)
+        except ValidationError as e:
+            await self.send_error(describe_error(e))
+            return
+        if event.event_type != event_type:
+            if event_type != "unknown":
+                # Поле event_type раньше настоящего (во вложенном объекте): лимит проверен не по тому типу
+                await self._drop(event_type, "mismatch")
+                return
+            # Тип не нашёлся до разбора, списан только токен "*": у типа со своим лимитом проверяется и он
+            if (event.event_type in self.limiter.limits or event.event_type in self.table.limiter.limits) \
+                    and await self._over_limit(event.event_type):
+                return
+        self.dropped = 0
+        self.log_context["event_type"] = event.event_type
+        await self.router.dispatch(self, event)
 
 
 class Table:
@@ -105,25 +250,97 @@ class Table:
         self.table_answers: List[int] = []
         self.answered: bool = False
 
-    async def add_client(self, client_ws) -> Client:
-        client = Client(self, client_ws)
-        if self.leader is None:
+        # Клиенты стола, подключенные к другим процессам:
+        # worker_id -> (есть лидер, число наблюдателей, когда лидер им стал)
+        self.remote_clients: Dict[str, Tuple[bool, int, float]] = {}
+        # Отложенная рассылка, которая соберёт частые изменения черновика ответа в одну
+        self._scheduled_notify: asyncio.Task | None = None
+        # Лимиты событий лидера: общие для всех его переподключений
+        self.limiter = RateLimiter(TABLE_LIMITS)
+
+        # Последнее разосланное состояние стола и его номер для протокола с патчами
+        self.version = 0
+        self._state: dict | None = None
+        self.state_body = ""
+        # Патч к текущей версии от предыдущей и её кадры MessagePack, собранные по первому запросу
+        self._patch: List[dict] | None = None
+        self._patch_body: str | None = None
+        self._packed: Dict[tuple, bytes] = {}
+
+    def has_remote_leader(self) -> bool:
+        return any(leader for leader, _, _ in self.remote_clients.values())
+
+    def clients_count(self) -> int:
+        local = len(self.observers) + (1 if self.leader else 0)
+        return local + sum(int(leader) + observers for leader, observers, _ in self.remote_clients.values())
+
+    def _update_waiting_state(self):
+        if self.state in (TableState.waiting_leader, TableState.waiting_game_start):
+            has_leader = self.leader is not None or self.has_remote_leader()
+            self.state = TableState.waiting_game_start if has_leader else TableState.waiting_leader
+
+    async def publish_presence(self):
+        await self.game.publish(
+            "presence", table_id=self.id, leader=self.leader is not None, observers=len(self.observers),
+            since=self.leader.leader_since if self.leader else 0.0,
+        )
+
+    async def apply_presence(self, worker_id: str, leader: bool, observers: int, since: float = 0.0):
+        """Обновить число клиентов стола в другом процессе."""
+        if leader or observers:
+            self.remote_clients[worker_id] = (leader, observers, since)
+        else:
+            self.remote_clients.pop(worker_id, None)
+
+        changed = False
+        own_id = self.game.backend.worker_id
+        if leader and self.leader is not None and (since, worker_id) < (self.leader.leader_since, own_id):
+            # Лидеров назначили одновременно в двух процессах: остаётся ставший лидером раньше
+            # (при равенстве - из процесса с меньшим worker_id), второй процесс решает так же
+            demoted = self.leader
+            self.leader = None
+            demoted.role = ClientRole.observer
+            self.observers.insert(0, demoted)
+            await demoted.send_table_event()
+            changed = True
+        elif self.leader is None and self.observers and not self.has_remote_leader():
+            # Лидер ушёл в другом процессе: нового назначает процесс с наименьшим worker_id среди тех,
+            # где есть наблюдатели, чтобы лидер появился ровно в одном процессе
+            worker_ids = [w for w, (_, count, _) in self.remote_clients.items() if count]
+            if own_id <= min(worker_ids, default=own_id):
+                self.leader = self.observers.pop(0)
+                self.leader.role = ClientRole.leader
+                await self.leader.send_table_event()
+                changed = True
+
+        self._update_waiting_state()
+        await self.notify_clients()
+        await self.game.notify_screens()
+        if changed:
+            await self.publish_presence()
+
+    async def add_client(self, client_ws, protocol: int = 1, encoding: str = wire.ENCODING_JSON) -> Client:
+        client = Client(self, client_ws, protocol=protocol, encoding=encoding)
+        if self.leader is None and not self.has_remote_leader():
             self.leader = client
             client.role = ClientRole.leader
-            if self.state == TableState.waiting_leader:
-                self.state = TableState.waiting_game_start
         else:
             self.observers.append(client)
+        self._update_waiting_state()
 
         client.table = self
 
+        client.send_ping()
         await client.send_table_event()
         await self.notify_clients()
         await self.game.notify_screens()
+        await self.publish_presence()
         return client
 
     async def remove_client(self, client):
-        if client.role == ClientRole.leader or self.leader == client:
+        """Убрать клиента со стола. Повторный вызов ничего не делает: клиента, отключенного из-за его очереди
+        (Client.disconnect), потом убирает ещё и цикл сокета."""
+        if client is self.leader:
             if self.observers:
                 new_leader = self.observers.pop(0)
                 new_leader.role = ClientRole.leader
@@ -131,14 +348,20 @@ class Table:
                 await self.leader.send_table_event()
             else:
                 self.leader = None
-                if self.state == TableState.waiting_game_start:
-                    self.state = TableState.waiting_leader
         elif client in self.observers:
             self.observers.remove(client)
+        else:
+            return
+        self._update_waiting_state()
+        self.game.touch()
         await self.notify_clients()
         await self.game.notify_screens()
+        await self.publish_presence()
 
-    async def change_leader(self):
+    async def change_leader(self, remote: bool = False):
+        if not remote:
+            # Лидер стола может быть подключен к другому процессу
+            await self.game.publish("change_leader", table_id=self.id)
         if not self.leader:
             return
 
@@ -148,8 +371,9 @@ class Table:
 
         if not (client.connection.application_state == WebSocketState.CONNECTED and
                 client.connection.client_state == WebSocketState.CONNECTED):
+            client.outbox.stop()
             await client.connection.close()
-            print('####### close')
+            log.info("leader_gone", **client.log_context)
             return
         self.observers.append(client)
         client.role = ClientRole.observer
@@ -157,48 +381,153 @@ class Table:
 
         await self.notify_clients()
         await self.game.notify_screens()
+        await self.publish_presence()
+
+    def build_table_event(self) -> dict:
+        """Общее для всех клиентов стола событие (без поля role)."""
+        question_manager = self.game.question_manager
+        question = question_manager.current_question
+        data = TableEvent(
+            table_id=self.id,
+            role=ClientRole.observer,
+            clients=self.clients_count(),
+            table_state=self.state,
+            table_name=self.name,
+            table_answers=self.table_answers,
+            answered=self.answered,
+            result=self.get_to_table_result(with_questions=False),
+        ).model_dump(mode="json", exclude={"role"})
+        data["question"] = question.model_dump() if question else None
+        if data["result"] is not None:
+            # Вопросы в итогах одинаковы для всех столов: собираются один раз
+            data["result"]["questions"] = question_manager.results_questions()
+        return data
+
+    def commit_state(self) -> List[dict] | None:
+        """Зафиксировать текущее состояние стола новой версией, если оно изменилось.
+
+        Вернуть патч от предыдущей версии ([] - состояние не изменилось, None - предыдущей версии нет).
+        """
+        start = time.perf_counter()
+        try:
+            with span("build_table"):
+                data = self.build_table_event()
+            if data == self._state:
+                return []
+            with span("diff"):
+                patch = make_patch(self._state, data) if self._state is not None else None
+            self._state = data
+            with span("serialize"):
+                self.state_body = wire.dumps(data)
+            self.version += 1
+            self._patch = patch
+            self._patch_body = None
+            self._packed = {}
+            return patch
+        finally:
+            SERIALIZE_SECONDS.labels("table").observe(time.perf_counter() - start)
+
+    def packed_state(self, role: ClientRole, versioned: bool = False) -> bytes:
+        """Текущее состояние в MessagePack: кодируется один раз на роль за версию."""
+        key = (role, versioned)
+        if key not in self._packed:
+            self._packed[key] = wire.pack_state(self._state, role, self.version if versioned else None)
+        return self._packed[key]
+
+    def patch_body(self) -> str | None:
+        """Патч к текущей версии от предыдущей в JSON, сериализуется один раз за версию."""
+        if self._patch_body is None and self._patch:
+            self._patch_body = wire.dumps_model(TablePatchEvent(version=self.version, patch=self._patch))
+        return self._patch_body
+
+    def packed_patch(self) -> bytes:
+        if ("patch",) not in self._packed:
+            self._packed[("patch",)] = wire.pack(
+                TablePatchEvent(version=self.version, patch=self._patch).model_dump(mode="json")
+            )
+        return self._packed[("patch",)]
 
     async def notify_clients(self):
-        await asyncio.gather(*[
-            client.send_table_event()
-            for client in self.observers + ([self.leader] if self.leader else [])
-        ])
+        # Немедленная рассылка отправляет и все отложенные изменения
+        if self._scheduled_notify is not None:
+            self._scheduled_notify.cancel()
+            self._scheduled_notify = None
+        clients = self.observers + ([self.leader] if self.leader else [])
+        if not clients:
+            return
+        start = time.perf_counter()
+        with span("notify_clients"):
+            # Событие сериализуется один раз на стол, клиентам отличается только role
+            self.commit_state()
+            patch_body = None
+            # Версию мог зафиксировать и send_table_event нового клиента: остальным она нужна патчем
+            if any(client.protocol >= PROTOCOL_PATCH and client.version == self.version - 1 for client in clients):
+                patch_body = self.patch_body()
+            await asyncio.gather(*[client.send_table_event(self.state_body, patch_body) for client in clients])
+        BROADCAST_SECONDS.labels("notify_clients").observe(time.perf_counter() - start)
+
+    async def schedule_notify(self):
+        """Разослать состояние стола одной рассылкой на все изменения за NOTIFY_COALESCE_WINDOW секунд."""
+        if NOTIFY_COALESCE_WINDOW <= 0:
+            await self.notify_clients()
+        elif self._scheduled_notify is None:
+            self._scheduled_notify = profiler.create_task(self._delayed_notify())
+
+    async def _delayed_notify(self):
+        await asyncio.sleep(NOTIFY_COALESCE_WINDOW)
+        self._scheduled_notify = None
+        await self.notify_clients()
 
-    async def set_name(self, name: str):
+    async def set_name(self, name: str, remote: bool = False):
         if len(name) > 30:
             raise ValueError("Название стола не должно превышать 30 символов")
+        if name == self.name:
+            # Повтор того же названия не рассылается всему залу
+            return
         self.name = name
+        leaderboard = self.game.leaderboard
+        if leaderboard is not None and self.id in leaderboard.featured:
+            # Итоги на экране меняются, только если в них есть этот стол
+            self.game.invalidate_results()
 
         # Notify all clients about the new table name
         await self.notify_clients()
         await self.game.notify_screens()
+        if not remote:
+            await self.game.publish("set_name", table_id=self.id, name=name)
 
     async def start_game(self):
         self.state = TableState.in_question
         # Notify all clients about the game start
         await self.notify_clients()
 
-    async def set_table_answers(self, table_answers: List[int]):
+    def _check_can_answer(self, not_in_question_error: str, grace: float = ANSWER_GRACE):
         if self.state != TableState.in_question:
-            raise ValueError("Not in answers")
+            raise ValueError(not_in_question_error)
         question = self.game.question_manager.current_question
         if not question:
             raise ValueError("No current question")
-        if question.time_left_with_gap() <= 0:
+        if question.time_left_with_gap(grace) <= 0:
             raise ValueError("Время вышло")
 
-        self.table_answers = table_answers
-        # Notify all clients about the answer
-        await self.notify_clients()
+    async def set_table_answers(self, table_answers: List[int], remote: bool = False, grace: float = ANSWER_GRACE):
+        # Изменения из другого процесса там уже проверены
+        if not remote:
+            self._check_can_answer("Not in answers", grace)
+        if table_answers == self.table_answers:
+            return
 
-    async def answer_question(self, table_answers: List[int]):
-        if self.state != TableState.in_question:
-            raise ValueError("Not in question")
+        self.table_answers = table_answers
+        # Лидер быстро переключает варианты, наблюдателям достаточно последнего состояния
+        await self.schedule_notify()
+        if not remote:
+            await self.game.publish("set_answers", table_id=self.id, table_answers=table_answers)
+
+    async def answer_question(self, table_answers: List[int], remote: bool = False, grace: float = ANSWER_GRACE):
+        """Принять ответ стола; grace - запас после окончания таймера по задержке сети лидера."""
+        if not remote:
+            self._check_can_answer("Not in question", grace)
         question = self.game.question_manager.current_question
-        if not question:
-            raise ValueError("No current question")
-        if question.time_left_with_gap() <= 0:
-            raise ValueError("Время вышло")
 
         self.table_answers = table_answers
         self.answered = True
@@ -206,6 +535,8 @@ class Table:
         # Notify all clients about the answer
         await self.notify_clients()
         await self.game.table_answered_notify(self)
+        if not remote:
+            await self.game.publish("answer", table_id=self.id, table_answers=table_answers)
 
     async def show_answers(self):
         if self.state != TableState.in_question:
@@ -235,7 +566,8 @@ class Table:
             answers=self.result.answers,
         )
 
-    def get_to_table_result(self) -> ToTableResult | None:
+    def get_to_table_result(self, with_questions: bool = True) -> ToTableResult | None:
+        """Итоги стола; без with_questions список вопросов пустой (его подставляет build_table_event)."""
         if self.state != TableState.in_results:
             return None
 
@@ -244,10 +576,10 @@ class Table:
             question_score=self.result.question_score,
             categories={k: v for k, v in self.result.categories.items() if not k.startswith('_')},
             answers=self.result.answers,
-            questions=[q.get_model() for q in self.game.question_manager.questions],
+            questions=[q.get_model() for q in self.game.question_manager.questions] if with_questions else [],
             place=self.game.get_table_place(self),
             place_categories=self.game.get_table_place_categories(self),
-            place_amount=len(self.game.tables),
+            place_amount=self.game.get_place_amount(),
         )
 
     async def show_result(self):
@@ -256,12 +588,18 @@ class Table:
 
     async def reset_table(self):
         self.state = TableState.waiting_leader
+        if self._scheduled_notify is not None:
+            self._scheduled_notify.cancel()
+            self._scheduled_notify = None
         if self.leader:
+            self.leader.outbox.stop()
             await self.leader.connection.close()
             self.leader = None
         for observer in self.observers:
+            observer.outbox.stop()
             await observer.connection.close()
         self.observers.clear()
+        self.remote_clients.clear()
         self.table_answers.clear()
         self.answered = False
         self.result = Result()
@@ -279,7 +617,7 @@ class Table:
             "state": self.state.value,
             "leader": self.leader is not None,
             "observers_count": len(self.observers),
-            "table_answers": self.table_answers,
+            "table_answers": list(self.table_answers),
             "answered": self.answered,
             "result": {
                 "score": self.result.score,
@@ -289,68 +627,223 @@ class Table:
             },
         }
 
+    def load_full_table_data(self, data: dict):
+        """Восстановить стол из get_full_table_data(). Подключения не восстанавливаются."""
+        self.name = data["name"]
+        self.state = TableState(data["state"])
+        self.table_answers = list(data["table_answers"])
+        self.answered = data["answered"]
+        self.result = Result.from_dict(data["result"])
+        self._update_waiting_state()
+
 
 class Game:
-    def __init__(self):
+    def __init__(self, code: str = DEFAULT_GAME, backend: StateBackend | None = None, journal: Journal | None = None):
+        self.code = code
+        self.backend = backend or MemoryBackend()
+        self.journal = journal
+        # Новая копия игры в общем бэкенде ждёт состояние от процессов, где игра уже идёт
+        self.awaiting_sync = False
+        self._synced = asyncio.Event()
+        self.last_activity = time.monotonic()
         self.tables: dict[int, Table] = {i: Table(self, i) for i in range(1, 9)}
         self.state = GameState.waiting
         self.question_manager = QuestionManager()
+        self.leaderboard: Leaderboard | None = None
+        # Итоги для экранов считаются один раз на версию: меняются только при подведении итогов,
+        # сбросе игры, смене состава или названий столов-победителей
+        self.results_version = 0
+        self._screen_results: Tuple[int, dict | None] | None = None
 
         self.screens: List['ScreenClient'] = []
+        self.admins: List['AdminClient'] = []
+
+        # Последнее разосланное экранам состояние и его номер для протокола с патчами
+        self.screen_version = 0
+        self._screen_state: dict | None = None
+        self.screen_state_body = ""
+        self._screen_patch: List[dict] | None = None
+        self._screen_patch_body: str | None = None
+        self._screen_packed: Dict[str, bytes] = {}
+
+        # Отсчёт времени текущего вопроса
+        self._timer_task: asyncio.Task | None = None
+        # Профили шагов ведущего (data/profiler.py)
+        self.profiler = Profiler(PROFILE_TRANSITIONS)
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def connections_count(self) -> int:
+        tables = sum(len(t.observers) + (1 if t.leader else 0) for t in self.tables.values())
+        return tables + len(self.screens) + len(self.admins)
+
+    async def publish(self, op: str, **args):
+        """Записать изменение в журнал и разослать копиям этой игры в других процессах."""
+        with span("publish"):
+            self.journal_op(op, args)
+            if not self.backend.shared:
+                return
+            if op not in ("presence", "sync_request"):
+                self.awaiting_sync = False
+            await self.backend.publish(self.code, {"op": op, **args})
+
+    def journal_op(self, op: str, args: dict):
+        """Записать изменение игры, своё или другого процесса, если журнал игры пишет этот процесс."""
+        journal = self.journal
+        if journal is None or op not in JOURNAL_OPS:
+            return
+        if journal.acquire():
+            # Снимок уже включает это изменение
+            journal.snapshot(self.get_full_game_data())
+        elif journal.owner:
+            journal.record(op, args)
+            if op in ("reset", "show_results") or journal.snapshot_due():
+                journal.snapshot(self.get_full_game_data())
+
+    async def request_sync(self):
+        if self.backend.shared:
+            self.awaiting_sync = True
+            self._synced.clear()
+            await self.publish("sync_request")
+
+    async def sync_from_peers(self, timeout: float) -> bool:
+        """Запросить состояние у других процессов и дождаться его. False - бэкенд не общий или никто не ответил."""
+        if not self.backend.shared:
+            return False
+        await self.request_sync()
+        try:
+            await asyncio.wait_for(self._synced.wait(), timeout)
+        except asyncio.TimeoutError:
+            # Игра идёт только здесь: её состояние - из журнала, поздний ответ его уже не заменит
+            self.awaiting_sync = False
+            return False
+        return True
+
+    async def send_sync(self):
+        """Отдать полное состояние игры и свои подключения новому (или переподключившемуся) процессу."""
+        # Свои подключения известны и процессу, который сам ждёт состояние
+        if not self.awaiting_sync:
+            await self.publish("sync", data=self.get_full_game_data())
+        for table in self.tables.values():
+            if table.leader or table.observers:
+                await table.publish_presence()
+
+    async def resync(self):
+        """После обрыва связи с бэкендом: запросить состояние у других процессов и объявить свои подключения.
+
+        Подключения других процессов заново приходят в ответ на запрос; если игра идёт только здесь,
+        ответа нет и остаётся своё состояние.
+        """
+        for table in self.tables.values():
+            table.remote_clients.clear()
+        await self.request_sync()
+        for table in self.tables.values():
+            if table.leader or table.observers:
+                await table.publish_presence()
+
+    async def load_sync(self, data: dict):
+        if not self.awaiting_sync:
+            return
+        self.awaiting_sync = False
+        self._synced.set()
+        self.load_full_game_data(data)
+        if self.journal is not None and self.journal.owner:
+            # Журнал этого процесса мог пропустить изменения других за время обрыва
+            self.journal.snapshot(self.get_full_game_data())
+        self.schedule_timer()
+        await asyncio.gather(*[table.notify_clients() for table in self.tables.values()])
+        await self.notify_screens()
+
+    async def apply_remote(self, message: dict):
+        """Применить изменение, опубликованное копией игры в другом процессе, и записать его в журнал."""
+        await self.apply_op(message)
+        self.journal_op(message["op"], {k: v for k, v in message.items() if k not in ("op", "worker")})
+
+    async def apply_op(self, message: dict):
+        """Применить изменение из сообщения другого процесса или записи журнала."""
+        op = message["op"]
+        if "table_id" in message:
+            table = self.get_table(message["table_id"])
+            if table is None:
+                return
+            table_handlers: Dict[str, Callable] = {
+                "presence": lambda: table.apply_presence(
+                    message["worker"], message["leader"], message["observers"], message.get("since", 0.0)
+                ),
+                "set_name": lambda: table.set_name(message["name"], remote=True),
+                "set_answers": lambda: table.set_table_answers(message["table_answers"], remote=True),
+                "answer": lambda: table.answer_question(message["table_answers"], remote=True),
+                "change_leader": lambda: table.change_leader(remote=True),
+            }
+            await table_handlers[op]()
+            return
+
+        handlers: Dict[str, Callable] = {
+            "start": lambda: self.start(remote=True),
+            "show_answers": lambda: self.show_answers(remote=True),
+            "previous_question": lambda: self.previous_question(remote=True),
+            "next_question": lambda: self.next_question(remote=True),
+            "show_results": lambda: self.show_results(remote=True),
+            "reset": lambda: self.reset_game(remote=True, quiz=message.get("quiz")),
+            "resize": lambda: self.resize_tables(message["count"], remote=True),
+            "timer": lambda: self.set_timer(message["time_left"], message["paused"], remote=True),
+            "sync_request": self.send_sync,
+            "sync": lambda: self.load_sync(message["data"]),
+        }
+        await handlers[op]()
 
     def get_table(self, table_id: int) -> Table | None:
         return self.tables.get(table_id)
 
+    def _build_leaderboard(self, tables: Iterable[Table] | None = None) -> Leaderboard:
+        return Leaderboard(
+            self.tables.values() if tables is None else tables,
+            [category for category in self.question_manager.categories.keys() if not category.startswith('_')],
+        )
+
+    def invalidate_results(self):
+        self.results_version += 1
+
+    def screen_results(self) -> dict | None:
+        """Итоги для экранов в json, общие для всех экранов игры."""
+        if self._screen_results is None or self._screen_results[0] != self.results_version:
+            results = self.calc_results()
+            self._screen_results = (self.results_version, results.model_dump(mode="json") if results else None)
+        return self._screen_results[1]
+
     def calc_results(self) -> ScreenResults | None:
-        if self.state != GameState.in_results:
+        if self.state != GameState.in_results or self.leaderboard is None:
             return None
-        table_results = [table.get_result() for table in self.tables.values() if table.get_result()]
+        # Экрану нужны только победители, а не итоги всех столов
+        table_results = {}
+        for table_id in self.leaderboard.featured:
+            table = self.tables.get(table_id)
+            if table is not None and table.state == TableState.in_results:
+                table_results[table_id] = table.get_result()
         return ScreenResults(
-            winers=sorted(table_results, key=lambda x: x.score, reverse=True)[:3],
+            winers=[table_results[tid] for tid in self.leaderboard.winners if tid in table_results],
             category_winners={
-                category: max(
-                    (tr for tr in table_results if category in tr.categories),
-                    key=lambda x: (x.categories[category], x.score),
-                    default=None
-                ) for category in self.question_manager.categories.keys() if not category.startswith('_')
+                category: table_results.get(tid) if tid is not None else None
+                for category, tid in self.leaderboard.category_winners.items()
             }
         )
 
     def get_table_place(self, table: Table) -> int | None:
-        if self.state != GameState.in_results or table.state != TableState.in_results:
+        if self.leaderboard is None or table.state != TableState.in_results:
             return None
-        sorted_tables = sorted(
-            self.tables.values(),
-            key=lambda t: t.result.score if t.result else 0,
-            reverse=True
-        )
-        for place, sorted_table in enumerate(sorted_tables, start=1):
-            if sorted_table.id == table.id:
-                return place
-
-        return None
+        return self.leaderboard.get_place(table.id)
 
     def get_table_place_categories(self, table: Table) -> Dict[str, int | None] | None:
-        if self.state != GameState.in_results or table.state != TableState.in_results:
+        if self.leaderboard is None or table.state != TableState.in_results:
             return None
-        place_categories = {}
-        for category in self.question_manager.categories.keys():
-            if category.startswith('_'):
-                continue
-            if category not in table.result.categories:
-                place_categories[category] = None
-
-            sorted_tables = sorted(
-                self.tables.values(),
-                key=lambda t: (t.result.categories[category], table.result.score),
-                reverse=True
-            )
-            for place, sorted_table in enumerate(sorted_tables, start=1):
-                if sorted_table.id == table.id:
-                    place_categories[category] = place
-        return place_categories
+        return self.leaderboard.get_place_categories(table.id)
 
-    async def resize_tables(self, count: int):
+    def get_place_amount(self) -> int:
+        """Сколько столов в зачёте: по итогам, а до них - сколько столов сейчас."""
+        return self.leaderboard.place_amount if self.leaderboard is not None else len(self.tables)
+
+    async def resize_tables(self, count: int, remote: bool = False):
         if count < 0:
             raise ValueError("Invalid table count")
 
@@ -365,126 +858,442 @@ class Game:
             # Добавляем новые столы
             for table_id in range(current_count + 1, count + 1):
                 self.tables[table_id] = Table(self, table_id)
+        if self.leaderboard is not None:
+            # Места и победители - среди оставшихся столов из итогов, новые столы в зачёт не входят
+            self.leaderboard = self._build_leaderboard(
+                [table for table in self.tables.values() if table.state == TableState.in_results]
+            )
+        self.invalidate_results()
+        if not remote:
+            await self.publish("resize", count=count)
 
-    async def add_screen_client(self, connection: WebSocket):
-        screen_client = ScreenClient(self, connection)
+    async def add_screen_client(self, connection: WebSocket, protocol: int = 1, encoding: str = wire.ENCODING_JSON):
+        screen_client = ScreenClient(self, connection, protocol, encoding)
         self.screens.append(screen_client)
+        screen_client.send_ping()
         return screen_client
 
     async def remove_screen_client(self, screen_client: 'ScreenClient'):
-        self.screens.remove(screen_client)
+        screen_client.outbox.stop()
+        if screen_client in self.screens:
+            self.screens.remove(screen_client)
+        self.touch()
+
+    def add_admin_client(self, connection: WebSocket) -> 'AdminClient':
+        admin = AdminClient(self, connection)
+        self.admins.append(admin)
+        return admin
+
+    def remove_admin_client(self, admin: 'AdminClient'):
+        if admin in self.admins:
+            self.admins.remove(admin)
+        self.touch()
+
+    def build_screen_state(self) -> dict:
+        question = self.question_manager.current_question
+        data = ScreenTablesStateEvent(
+            game_state=self.state,
+            tables=[TableData(
+                table_id=table.id,
+                table_name=table.name,
+                table_state=table.state,
+                clients=table.clients_count(),
+                table_answers=table.table_answers,
+                answered=table.answered,
+            ) for table in self.tables.values()],
+        ).model_dump(mode="json")
+        data["question"] = question.model_dump() if question else None
+        data["results"] = self.screen_results()
+        return data
 
-    async def notify_screens(self):
-        await asyncio.gather(*[screen.send_state() for screen in self.screens])
+    def commit_screen_state(self) -> List[dict] | None:
+        """То же, что Table.commit_state, для состояния экранов."""
+        start = time.perf_counter()
+        try:
+            with span("build_screen"):
+                data = self.build_screen_state()
+            if data == self._screen_state:
+                return []
+            with span("diff"):
+                patch = make_patch(self._screen_state, data) if self._screen_state is not None else None
+            self._screen_state = data
+            with span("serialize"):
+                self.screen_state_body = wire.dumps(data)
+            self.screen_version += 1
+            self._screen_patch = patch
+            self._screen_patch_body = None
+            self._screen_packed = {}
+            return patch
+        finally:
+            SERIALIZE_SECONDS.labels("screen").observe(time.perf_counter() - start)
+
+    def packed_screen_state(self, versioned: bool = False) -> bytes:
+        """То же, что Table.packed_state, для состояния экранов."""
+        key = "versioned" if versioned else "state"
+        if key not in self._screen_packed:
+            self._screen_packed[key] = wire.pack_state(
+                self._screen_state, version=self.screen_version if versioned else None
+            )
+        return self._screen_packed[key]
+
+    def screen_patch_body(self) -> str | None:
+        if self._screen_patch_body is None and self._screen_patch:
+            self._screen_patch_body = wire.dumps_model(
+                ScreenPatchEvent(version=self.screen_version, patch=self._screen_patch)
+            )
+        return self._screen_patch_body
 
-    async def start(self):
+    def packed_screen_patch(self) -> bytes:
+        if "patch" not in self._screen_packed:
+            self._screen_packed["patch"] = wire.pack(
+                ScreenPatchEvent(version=self.screen_version, patch=self._screen_patch).model_dump(mode="json")
+            )
+        return self._screen_packed["patch"]
+
+    async def notify_screens(self):
+        if not self.screens:
+            return
+        start = time.perf_counter()
+        with span("notify_screens"):
+            # Состояние экрана одинаково для всех экранов игры
+            self.commit_screen_state()
+            patch_body = None
+            # Как в Table.notify_clients: версию мог зафиксировать send_state нового экрана
+            if any(screen.protocol >= PROTOCOL_PATCH and screen.version == self.screen_version - 1
+                   for screen in self.screens):
+                patch_body = self.screen_patch_body()
+            await asyncio.gather(*[screen.send_state(self.screen_state_body, patch_body) for screen in self.screens])
+        BROADCAST_SECONDS.labels("notify_screens").observe(time.perf_counter() - start)
+
+    async def start(self, remote: bool = False):
         if self.state != GameState.waiting:
             raise ValueError("Game already started")
         self.state = GameState.in_question
         self.question_manager.next_question()
         self.question_manager.current_question.start_timer()
+        self.schedule_timer()
         # Notify all clients about the game start
         await asyncio.gather(*[table.start_game() for table in self.tables.values()])
         await self.notify_screens()
+        await self.notify_timer()
+        if not remote:
+            await self.publish("start")
 
-    async def show_answers(self):
+    async def show_answers(self, remote: bool = False):
         if self.state != GameState.in_question:
             raise ValueError(f"Game not in question state: {self.state}")
         self.state = GameState.in_answers
+        self.cancel_timer()
 
         await asyncio.gather(*[table.show_answers() for table in self.tables.values()])
         await self.notify_screens()
+        if not remote:
+            await self.publish("show_answers")
 
-    async def previous_question(self):
+    async def previous_question(self, remote: bool = False):
         if self.state != GameState.in_answers and self.state != GameState.in_question:
             raise ValueError("Game not in answers state")
         self.question_manager.previous_question()
         self.state = GameState.in_question
         self.question_manager.current_question.start_timer()
+        self.schedule_timer()
         # Notify all clients about the game start
         await asyncio.gather(*[table.update_question() for table in self.tables.values()])
         await self.notify_screens()
+        await self.notify_timer()
+        if not remote:
+            await self.publish("previous_question")
 
-    async def next_question(self):
+    async def next_question(self, remote: bool = False):
         if self.state != GameState.in_answers and self.state != GameState.in_question:
             raise ValueError("Game not in answers state")
         self.question_manager.next_question()
         self.state = GameState.in_question
         self.question_manager.current_question.start_timer()
+        self.schedule_timer()
         # Notify all clients about the game start
         await asyncio.gather(*[table.update_question() for table in self.tables.values()])
         await self.notify_screens()
+        await self.notify_timer()
+        if not remote:
+            await self.publish("next_question")
 
-    async def show_results(self):
+    async def show_results(self, remote: bool = False):
         self.state = GameState.in_results
+        self.cancel_timer()
+        self.leaderboard = self._build_leaderboard()
+        self.invalidate_results()
         await asyncio.gather(*[table.show_result() for table in self.tables.values()])
         await self.notify_screens()
-        self.write_game()  # Сохраняем состояние игры после завершения
+        if not remote:
+            await self.publish("show_results")
+            if GAME_STATE_PATH:
+                await self.write_game(GAME_STATE_PATH)  # Сохраняем состояние игры после завершения
 
-    async def reset_game(self):
+    async def reset_game(self, remote: bool = False, quiz: str | None = None):
+        quiz_data = await quizzes.aget(quiz or self.question_manager.quiz.name)
         self.state = GameState.waiting
-        self.question_manager = QuestionManager()
+        self.cancel_timer()
+        self.question_manager = QuestionManager(quiz_data)
+        self.leaderboard = None
+        self.invalidate_results()
         for table in self.tables.values():
             await table.reset_table()
 
         await self.notify_screens()
+        if not remote:
+            await self.publish("reset", quiz=quiz_data.name)
+
+    def schedule_timer(self):
+        """Запустить отсчёт времени текущего вопроса заново (после смены вопроса или таймера)."""
+        self.cancel_timer()
+        question = self.question_manager.current_question
+        if self.state == GameState.in_question and question is not None and not question.paused and not question.closed:
+            self._timer_task = profiler.create_task(self._run_timer(question))
+
+    def cancel_timer(self):
+        if self._timer_task is not None:
+            self._timer_task.cancel()
+        self._timer_task = None
+
+    async def _run_timer(self, question: QuestionObject):
+        # Ответы принимаются ещё ANSWER_GRACE секунд после нуля, вопрос закрывается после них
+        while (left := question.time_left_with_gap()) > 0:
+            await asyncio.sleep(left)
+        # Задача больше не отменяется: закрытие вопроса само меняет состояние игры
+        self._timer_task = None
+        await self.close_question()
+
+    async def close_question(self):
+        """Время вопроса вышло."""
+        # Каждый процесс закрывает вопрос по своему таймеру, поэтому изменение не публикуется и не пишется в журнал
+        question = self.question_manager.current_question
+        if question is not None:
+            # Закрытие - часть состояния вопроса: его получают и подключившиеся позже, и после resync
+            question.closed = True
+        if TIMER_AUTO_SHOW_ANSWERS:
+            await self.show_answers(remote=True)
+        else:
+            await asyncio.gather(*[table.notify_clients() for table in self.tables.values()])
+            await self.notify_screens()
+        await self.notify_timer()
+
+    async def notify_timer(self):
+        """Разослать столам и экранам одно событие синхронизации таймера."""
+        question = self.question_manager.current_question
+        if question is None:
+            return
+        body = wire.dumps_model(TimerEvent(
+            question_id=question.id,
+            time_left=question.time_left,
+            deadline=question.deadline,
+            paused=question.paused,
+            closed=self.state != GameState.in_question or question.closed,
+        ))
+        with span("notify_timer"):
+            for table in self.tables.values():
+                for client in table.observers + ([table.leader] if table.leader else []):
+                    client.outbox.put_event(body)
+            for screen in self.screens:
+                screen.outbox.put_event(body)
+
+    async def set_timer(self, time_left: float, paused: bool, remote: bool = False):
+        """Поставить таймер текущего вопроса на паузу, продолжить или изменить оставшееся время."""
+        question = self.question_manager.current_question
+        if self.state != GameState.in_question or question is None:
+            raise ValueError(f"Game not in question state: {self.state}")
+        time_left = max(time_left, 0)
+        question.restore_timer(time_left, paused)
+        self.schedule_timer()
+
+        await asyncio.gather(*[table.notify_clients() for table in self.tables.values()])
+        await self.notify_screens()
+        await self.notify_timer()
+        if not remote:
+            await self.publish("timer", time_left=time_left, paused=paused)
+
+    async def pause_timer(self):
+        question = self.question_manager.current_question
+        await self.set_timer(question.time_left if question else 0, paused=True)
+
+    async def resume_timer(self):
+        question = self.question_manager.current_question
+        await self.set_timer(question.time_left if question else 0, paused=False)
+
+    async def extend_timer(self, seconds: float):
+        question = self.question_manager.current_question
+        if question is None:
+            raise ValueError("No current question")
+        await self.set_timer(question.time_left + seconds, paused=question.paused)
+
+    def ping_clients(self):
+        """Обновить замеры задержки всех телефонов и экранов игры."""
+        for table in self.tables.values():
+            for client in table.observers + ([table.leader] if table.leader else []):
+                client.send_ping()
+        for screen in self.screens:
+            screen.send_ping()
 
     async def table_answered_notify(self, table: Table):
         last = all(t.answered for t in self.tables.values() if t.state == TableState.in_question)
         await asyncio.gather(*[s.notify_table_answered(table, last=last) for s in self.screens])
 
+    def prefetch_urls(self) -> List[str]:
+        """Картинки, которые понадобятся дальше: ответы текущего вопроса и следующий вопрос."""
+        questions = self.question_manager.questions
+        index = self.question_manager.current_index
+        urls = []
+        if index is not None and self.state == GameState.in_question:
+            urls += questions[index].answer_images
+        next_index = 0 if index is None else index + 1
+        if self.state != GameState.in_results and next_index < len(questions):
+            urls += questions[next_index].images + questions[next_index].answer_images
+        return list(dict.fromkeys(urls))
+
     def get_full_game_data(self) -> dict:
         """Вернуть полные данные об игре."""
         return {
             "state": self.state.value,
+            "quiz": self.question_manager.quiz.name,
             "tables": {tid: table.get_full_table_data() for tid, table in self.tables.items()},
-            "questions": [q.get_model().model_dump(mode="json") for q in self.question_manager.questions],
-            "current_question_index": self.question_manager._QuestionManager__current_index,
+            "questions": [q.model_dump() for q in self.question_manager.questions],
+            "current_question_index": self.question_manager.current_index,
+            "timer_paused": bool(self.question_manager.current_question and self.question_manager.current_question.paused),
             "categories": list(self.question_manager.categories.keys()),
         }
 
-    def write_game(self, path: str = "game_state.json"):
+    def load_full_game_data(self, data: dict, elapsed: float = 0):
+        """Восстановить игру из get_full_game_data(), снятых elapsed секунд назад."""
+        self.state = GameState(data["state"])
+        quiz = quizzes.match(data.get("quiz", self.question_manager.quiz.name), data["questions"])
+        if quiz is not self.question_manager.quiz:
+            self.question_manager = QuestionManager(quiz)
+        index = data["current_question_index"]
+        paused = data.get("timer_paused", False)
+        time_left = None
+        if index is not None:
+            # Таймер на паузе не идёт и пока игра была выключена
+            time_left = max(data["questions"][index]["time_left"] - (0 if paused else elapsed), 0)
+        self.question_manager.restore(index, time_left, paused)
+        if index is not None and data["questions"][index].get("closed"):
+            self.question_manager.current_question.closed = True
+
+        tables = {int(tid): table_data for tid, table_data in data["tables"].items()}
+        self.tables = {tid: self.tables.get(tid) or Table(self, tid) for tid in sorted(tables)}
+        for tid, table_data in tables.items():
+            self.tables[tid].load_full_table_data(table_data)
+
+        self.leaderboard = self._build_leaderboard() if self.state == GameState.in_results else None
+        self.invalidate_results()
+
+    async def restore(self) -> bool:
+        """Восстановить игру из снимка и журнала после перезапуска сервера (если её нет в других процессах)."""
+        if self.journal is None:
+            return False
+        snapshot, entries = await asyncio.to_thread(self.journal.load)
+        if snapshot is None and not entries:
+            return False
+
+        if snapshot is not None:
+            self.load_full_game_data(snapshot["data"], elapsed=time.time() - snapshot["ts"])
+        # Последняя запись о таймере текущего вопроса: (время записи, оставшееся время, пауза)
+        timer = None
+        for entry in entries:
+            await self.apply_op(entry)
+            if entry["op"] in ("start", "next_question", "previous_question"):
+                timer = (entry["ts"], self.question_manager.current_question.timer, False)
+            elif entry["op"] == "timer":
+                timer = (entry["ts"], entry["time_left"], entry["paused"])
+
+        question = self.question_manager.current_question
+        if question and timer is not None:
+            ts, time_left, paused = timer
+            if not paused:
+                time_left -= time.time() - ts
+            question.restore_timer(max(time_left, 0), paused)
+            # Время на ответ вышло, пока сервер был выключен
+            question.closed = not paused and time_left + ANSWER_GRACE <= 0
+        self.schedule_timer()
+        return True
+
+    async def write_game(self, path: str = "game_state.json"):
         """Сохранить полные данные об игре в json."""
         data = self.get_full_game_data()
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        await asyncio.to_thread(_write_json, path, data)
 
 
 class AdminClient:
+    router = EventRouter()
+
     def __init__(self, game: Game, connection: WebSocket):
         self.game = game
         self.connection = connection
+        self.log_context = new_context(game=game.code, role="admin")
+
+    async def send(self, text: str):
+        wire.stats.record(text)
+        await self.connection.send_text(text)
 
-    async def resize_tables(self, event_data: dict):
-        event = ResizeTablesEvent(**event_data)
+    @router.on(ResizeTablesEvent)
+    async def resize_tables(self, event: ResizeTablesEvent):
         await self.game.resize_tables(event.count)
 
-    async def change_leader(self, event_data: dict):
-        event = FromAdminChangeLeaderEvent(**event_data)
+    @router.on(FromAdminChangeLeaderEvent)
+    async def change_leader(self, event: FromAdminChangeLeaderEvent):
         table = self.game.get_table(event.table_id)
         if table is None:
             raise ValueError("Table not found")
         await table.change_leader()
 
-    async def start_game(self, event_data: dict):
+    @router.on(FromAdminStartGameEvent)
+    async def start_game(self, event: FromAdminStartGameEvent):
         await self.game.start()
 
-    async def show_answers(self, event_data: dict):
+    @router.on(FromAdminShowAnswersEvent)
+    async def show_answers(self, event: FromAdminShowAnswersEvent):
         await self.game.show_answers()
 
-    async def previous_question(self, event_data: dict):
+    @router.on(FromAdminPreviousQuestionEvent)
+    async def previous_question(self, event: FromAdminPreviousQuestionEvent):
         await self.game.previous_question()
 
-    async def next_question(self, event_data: dict):
+    @router.on(FromAdminNextQuestionEvent)
+    async def next_question(self, event: FromAdminNextQuestionEvent):
         await self.game.next_question()
 
-    async def show_results(self, event_data: dict):
+    @router.on(FromAdminResultsEvent)
+    async def show_results(self, event: FromAdminResultsEvent):
         await self.game.show_results()
 
-    async def reset_game(self, event_data: dict):
-        await self.game.reset_game()
+    @router.on(FromAdminResetGameEvent)
+    async def reset_game(self, event: FromAdminResetGameEvent):
+        await self.game.reset_game(quiz=event.quiz)
+
+    @router.on(FromAdminPauseTimerEvent)
+    async def pause_timer(self, event: FromAdminPauseTimerEvent):
+        await self.game.pause_timer()
+
+    @router.on(FromAdminResumeTimerEvent)
+    async def resume_timer(self, event: FromAdminResumeTimerEvent):
+        await self.game.resume_timer()
 
-    async def next_step(self, event_data: dict):
+    @router.on(FromAdminExtendTimerEvent)
+    async def extend_timer(self, event: FromAdminExtendTimerEvent):
+        await self.game.extend_timer(event.seconds)
+
+    @router.on(FromAdminSetProfilingEvent)
+    async def set_profiling(self, event: FromAdminSetProfilingEvent):
+        self.game.profiler.enabled = event.enabled
+
+    @router.on(FromAdminGetProfilesEvent)
+    async def get_profiles(self, event: FromAdminGetProfilesEvent):
+        profiler = self.game.profiler
+        await self.send(wire.dumps_model(ProfilesEvent(
+            enabled=profiler.enabled, profiles=profiler.to_list(), folded=profiler.folded()
+        )))
+
+    @router.on(FromAdminNextStepEvent)
+    async def next_step(self, event: FromAdminNextStepEvent):
         if self.game.state == GameState.waiting:
             await self.game.start()
         elif self.game.state == GameState.in_question:
@@ -494,69 +1303,92 @@ class AdminClient:
         else:
             raise ValueError(f"Game not in a valid state for next step: {self.game.state}")
 
-    async def ws_handler(self, event_data: dict):
-        event_type = event_data.get("event_type")
-        handlers: Dict[Literal, Callable] = {
-            FromAdminEventTypes.from_admin_resize_tables: self.resize_tables,
-            FromAdminEventTypes.from_admin_change_leader: self.change_leader,
-            FromAdminEventTypes.from_admin_start_game: self.start_game,
-            FromAdminEventTypes.from_admin_show_answers: self.show_answers,
-            FromAdminEventTypes.from_admin_previous_question: self.previous_question,
-            FromAdminEventTypes.from_admin_next_question: self.next_question,
-            FromAdminEventTypes.from_admin_show_results: self.show_results,
-            FromAdminEventTypes.from_admin_reset_game: self.reset_game,
-            FromAdminEventTypes.from_admin_next_step: self.next_step,
-        }
-        handler = handlers.get(event_type)
-        if handler:
-            try:
-                await handler(event_data)
-            except Exception as e:
-                await self.connection.send_json(ErrorEvent(error=str(e)).model_dump(mode='json'))
-        else:
-            await self.connection.send_json(ErrorEvent(error="Unknown event type").model_dump(mode='json'))
+    async def ws_handler(self, frame: str | bytes | dict):
+        try:
+            event = self.router.decode(frame)
+        except ValidationError as e:
+            await self.send(wire.dumps_model(ErrorEvent(error=describe_error(e))))
+            return
+        self.log_context["event_type"] = event.event_type
+        try:
+            if event.event_type in PROFILED_ADMIN_EVENTS:
+                with self.game.profiler.transition(event.event_type):
+                    await self.router.dispatch(self, event)
+            else:
+                await self.router.dispatch(self, event)
+        except Exception as e:
+            await self.send(wire.dumps_model(ErrorEvent(error=str(e))))
 
 
 class ScreenClient:
-    def __init__(self, game: Game, connection: WebSocket):
+    router = EventRouter()
+
+    def __init__(self, game: Game, connection: WebSocket, protocol: int = 1, encoding: str = wire.ENCODING_JSON):
         self.game = game
         self.connection = connection
+        self.log_context = new_context(game=game.code, role="screen")
+        self.protocol = protocol
+        self.encoding = encoding
+        self.version = -1
+        self.outbox = Outbox(connection, self.disconnect, OUTBOX_MAX_MESSAGES, OUTBOX_MAX_LAG)
+        self.clock = ClockEstimator()
+
+    async def send_state(self, body: str | None = None, patch: str | None = None):
+        """Отправить состояние экрана, аналогично Client.send_table_event."""
+        game = self.game
+        if body is None:
+            game.commit_screen_state()
+            body, patch = game.screen_state_body, None
+        packed = self.encoding == wire.ENCODING_MSGPACK
+        if self.protocol < PROTOCOL_PATCH:
+            frame = game.packed_screen_state() if packed else body
+        elif self.version == game.screen_version:
+            return
+        elif patch is not None and self.version == game.screen_version - 1 and not self.outbox.state_pending:
+            frame = game.packed_screen_patch() if packed else patch
+        else:
+            frame = game.packed_screen_state(versioned=True) if packed else wire.with_version(body, game.screen_version)
+        self.version = game.screen_version
+        self.outbox.put_state(frame)
 
-    async def send_state(self):
-        question = self.game.question_manager.current_question
-        if question:
-            question = question.get_model()
-        data = ScreenTablesStateEvent(
-            game_state=self.game.state,
-            tables=[TableData(
-                table_id=table.id,
-                table_name=table.name,
-                table_state=table.state,
-                clients=len(table.observers) + 1 if table.leader else 0,
-                table_answers=table.table_answers,
-                answered=table.answered,
-            ) for table in self.game.tables.values()],
-            question=question,
-            results=self.game.calc_results()
-        ).model_dump(mode="json")
+    async def disconnect(self):
+        await self.game.remove_screen_client(self)
         try:
-            await self.connection.send_json(data)
+            await self.connection.close()
         except Exception as e:
-            print(f"Error sending table event: {e}")
-            await self.game.remove_screen_client(self)
-            try:
-                await self.connection.close()
-            except Exception as e:
-                print(f"Error closing connection: {e}")
+            log.warning("close_failed", error=str(e), **self.log_context)
 
     async def notify_table_answered(self, table: Table, last: bool = False):
-        await self.connection.send_json(
+        self.outbox.put_event(wire.dumps_model(
             ScreenTableAnsweredEvent(
                 table_id=table.id,
                 table_name=table.name,
                 last=last
-            ).model_dump(mode='json')
-        )
+            )
+        ))
+
+    def send_ping(self):
+        ping_id, server_time = self.clock.ping()
+        self.outbox.put_event(wire.dumps_model(PingEvent(id=ping_id, server_time=server_time)))
 
-    async def ws_handler(self, event_data: dict):
-        pass
+    @router.on(FromResyncEvent)
+    async def handle_resync(self, event: FromResyncEvent):
+        self.version = -1
+        await self.send_state()
+
+    @router.on(FromPongEvent)
+    async def handle_pong(self, event: FromPongEvent):
+        if self.clock.pong(event.id, event.client_time):
+            self.outbox.put_event(wire.dumps_model(
+                ClockEvent(offset=self.clock.offset, rtt=self.clock.rtt)
+            ))
+
+    async def ws_handler(self, frame: str | bytes | dict):
+        try:
+            event = self.router.decode(frame, binary=self.encoding == wire.ENCODING_MSGPACK)
+        except ValidationError as e:
+            # Экрану ошибки не отправляются, как и раньше неизвестные события пропускаются
+            log.info("bad_event", error=describe_error(e), **self.log_context)
+            return
+        self.log_context["event_type"] = event.event_type
+        await self.router.dispatch(self, event)
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable
+
+from fastapi import WebSocket
+
+from data import wire, profiler
+from data.log import get_logger
+from data.metrics import OUTBOX_DELAY_SECONDS
+
+log = get_logger(__name__)
+
+
+class Outbox:
+    """Очередь исходящих сообщений одного сокета со своей задачей-писателем.
+
+    Рассылки только кладут сообщения в очередь и не ждут медленные телефоны. Состояние (стола или экрана)
+    занимает в очереди одно место: новое состояние заменяет ещё не отправленное. Остальные события
+    отправляются по порядку. Если очередь переполнена или сокет не получает сообщения дольше max_lag
+    секунд, он отключается через on_error. Размеры отправленного учитываются в wire.stats.
+    """
+
+    def __init__(
+            self,
+            connection: WebSocket,
+            on_error: Callable[[], Awaitable[None]],
+            max_messages: int = 64,
+            max_lag: float = 10.0,
+    ):
+        self.connection = connection
+        self.on_error = on_error
+        self.max_messages = max_messages
+        self.max_lag = max_lag
+
+        # Элементы очереди: [текст (str - текстовый кадр, bytes - бинарный), время постановки в очередь,
+        # span профиля, из которого сообщение поставлено (profiler.mark)]
+        self._queue: deque[list] = deque()
+        self._state_item: list | None = None
+        self._wakeup = asyncio.Event()
+        self._closed = False
+        self._writer = profiler.create_task(self._run())
+        self._fail_task: asyncio.Task | None = None
+
+    @property
+    def state_pending(self) -> bool:
+        """Есть ли неотправленное состояние, которое заменит следующий put_state."""
+        return self._state_item is not None
+
+    def put_state(self, text: str | bytes):
+        if self._closed:
+            return
+        if self.lag() > self.max_lag:
+            self._fail()
+            return
+        if self._state_item is not None:
+            # Время постановки не обновляется: отставание считается от самого старого неотправленного
+            self._state_item[0] = text
+            self._state_item[2] = profiler.mark()
+        else:
+            self._state_item = [text, time.monotonic(), profiler.mark()]
+            self._put(self._state_item)
+
+    def put_event(self, text: str | bytes):
+        if self._closed:
+            return
+        self._put([text, time.monotonic(), profiler.mark()])
+
+    def _put(self, item: list):
+        if len(self._queue) >= self.max_messages or self.lag() > self.max_lag:
+            self._fail()
+            return
+        self._queue.append(item)
+        self._wakeup.set()
+
+    def lag(self) -> float:
+        """Сколько секунд ждёт самое старое неотправленное сообщение."""
+        if not self._queue:
+            return 0.0
+        return time.monotonic() - self._queue[0][1]
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            while self._queue:
+                # Сообщение убирается из очереди только после отправки, чтобы отставание учитывало зависшую отправку
+                item = self._queue[0]
+                text = item[0]
+                if item is self._state_item:
+                    self._state_item = None
+                wire.stats.record(text)
+                send_start = time.perf_counter()
+                try:
+                    if isinstance(text, bytes):
+                        await self.connection.send_bytes(text)
+                    else:
+                        await self.connection.send_text(text)
+                except Exception as e:
+                    log.warning("send_failed", error=str(e), event_type=wire.event_type(text))
+                    self._closed = True
+                    await self.on_error()
+                    return
+                OUTBOX_DELAY_SECONDS.labels().observe(time.monotonic() - item[1])
+                if item[2] is not None:
+                    # Ожидание за предыдущими сообщениями этого сокета и сама отправка
+                    parent, queued = item[2]
+                    socket_span = parent.add("socket", queued, time.perf_counter())
+                    socket_span.add("queued", queued, send_start)
+                    socket_span.add("send", send_start, socket_span.end)
+                if self._queue and self._queue[0] is item:
+                    self._queue.popleft()
+
+    def _fail(self):
+        self._closed = True
+        self._fail_task = profiler.create_task(self.on_error())
+
+    def stop(self):
+        self._closed = True
+        self._queue.clear()
+        self._state_item = None
+        if self._writer is not asyncio.current_task():
+            self._writer.cancel()
@@ -0,0 +1,30 @@
+from typing import Any, List
+
+# Версия протокола, в которой после полного состояния клиенту приходят только патчи к нему
+PROTOCOL_PATCH = 2
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def make_patch(old: Any, new: Any, path: str = "") -> List[dict]:
+    """JSON Patch (RFC 6902) из операций add / remove / replace, превращающий old в new.
+
+    Вложенные словари сравниваются по ключам, списки и прочие значения заменяются целиком.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key, value in old.items():
+            pointer = f"{path}/{_escape(key)}"
+            if key not in new:
+                ops.append({"op": "remove", "path": pointer})
+            elif value != new[key]:
+                ops.extend(make_patch(value, new[key], pointer))
+        for key, value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": value})
+        return ops
+    if old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
@@ -0,0 +1,151 @@
+"""Профилирование переходов ведущего: дерево отрезков времени на каждый шаг игры.
+
+Шаг ведущего (start, show_answers, next_question, show_results) рассылает состояние всем телефонам и экранам
+сразу. Профиль шага - дерево span: сборка моделей, сериализация, рассылки и по каждому сокету ожидание в его
+очереди и сама отправка. Отправки заканчиваются уже после обработчика ведущего, поэтому профиль дорастает
+до последнего отправленного сообщения.
+
+Текущий span хранится в ContextVar: он переходит в задачи asyncio.gather и в очереди сокетов (Outbox).
+Задачи, которые живут дольше шага (таймер вопроса, писатель очереди сокета), запускаются через
+create_task этого модуля, без текущего span. Пока профилирование выключено, span() - одна проверка ContextVar.
+"""
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Deque, Dict, List, Tuple
+
+_current: ContextVar['Span | None'] = ContextVar("profile_span", default=None)
+_NULL = nullcontext()
+
+
+class Span:
+    __slots__ = ("name", "start", "end", "children")
+
+    def __init__(self, name: str, start: float | None = None, end: float | None = None):
+        self.name = name
+        self.start = time.perf_counter() if start is None else start
+        self.end = end
+        self.children: List['Span'] = []
+
+    def add(self, name: str, start: float, end: float) -> 'Span':
+        """Добавить уже закончившийся дочерний span."""
+        child = Span(name, start, end)
+        self.children.append(child)
+        return child
+
+    def finish_time(self) -> float:
+        """Конец вместе с дочерними: отправки по сокетам заканчиваются позже обработчика."""
+        end = self.end if self.end is not None else time.perf_counter()
+        return max([end] + [child.finish_time() for child in self.children])
+
+    def to_dict(self, origin: float | None = None) -> dict:
+        if origin is None:
+            origin = self.start
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) * 1000, 3),
+            "duration_ms": round((self.finish_time() - self.start) * 1000, 3),
+            "children": [child.to_dict(origin) for child in sorted(self.children, key=lambda c: c.start)],
+        }
+
+    def folded(self, prefix: str = "") -> Dict[str, int]:
+        """Стеки в формате collapsed (flamegraph.pl, speedscope): стек -> собственное время, микросекунды."""
+        stack = f"{prefix};{self.name}" if prefix else self.name
+        duration = self.finish_time() - self.start
+        stacks: Dict[str, int] = {}
+        for child in self.children:
+            duration -= child.finish_time() - child.start
+            for key, value in child.folded(stack).items():
+                stacks[key] = stacks.get(key, 0) + value
+        # У параллельных дочерних (gather, сокеты) сумма больше родителя: собственное время тогда 0
+        stacks[stack] = stacks.get(stack, 0) + max(int(duration * 1_000_000), 0)
+        return stacks
+
+
+class _SpanContext:
+    __slots__ = ("name", "span", "token")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self) -> Span:
+        parent = _current.get()
+        self.span = Span(self.name)
+        parent.children.append(self.span)
+        self.token = _current.set(self.span)
+        return self.span
+
+    def __exit__(self, *exc):
+        self.span.end = time.perf_counter()
+        _current.reset(self.token)
+        return False
+
+
+def span(name: str):
+    """with span("serialize"): ... - отрезок внутри текущего профиля; без профиля ничего не делает."""
+    if _current.get() is None:
+        return _NULL
+    return _SpanContext(name)
+
+
+def create_task(coro) -> asyncio.Task:
+    """asyncio.create_task вне текущего профиля: иначе работа задачи после шага ведущего попала бы в его профиль.
+    Остальной контекст (поля логов подключения) задача получает как обычно."""
+    context = contextvars.copy_context()
+    context.run(_current.set, None)
+    return asyncio.create_task(coro, context=context)
+
+
+def mark() -> Tuple[Span, float] | None:
+    """Запомнить текущий span и время для сообщения, которое уйдёт позже (очередь сокета)."""
+    parent = _current.get()
+    if parent is None:
+        return None
+    return parent, time.perf_counter()
+
+
+class Profiler:
+    """Профили последних шагов ведущего одной игры. Включается настройкой или командой ведущего."""
+
+    def __init__(self, enabled: bool = False, keep: int = 20):
+        self.enabled = enabled
+        self.profiles: Deque[Span] = deque(maxlen=keep)
+
+    def transition(self, name: str):
+        """with profiler.transition("from_admin_next_step"): ... - записать профиль шага."""
+        if not self.enabled:
+            return _NULL
+        return _Transition(self, name)
+
+    def to_list(self) -> List[dict]:
+        return [profile.to_dict() for profile in self.profiles]
+
+    def folded(self) -> str:
+        """Все сохранённые профили одним файлом collapsed stacks."""
+        stacks: Dict[str, int] = {}
+        for profile in self.profiles:
+            for key, value in profile.folded().items():
+                stacks[key] = stacks.get(key, 0) + value
+        return "".join(f"{key} {value}\n" for key, value in stacks.items() if value)
+
+
+class _Transition:
+    __slots__ = ("profiler", "name", "root", "token")
+
+    def __init__(self, profiler: Profiler, name: str):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self) -> Span:
+        self.root = Span(self.name)
+        self.profiler.profiles.append(self.root)
+        self.token = _current.set(self.root)
+        return self.root
+
+    def __exit__(self, *exc):
+        self.root.end = time.perf_counter()
+        _current.reset(self.token)
+        return False
@@ -1,51 +1,97 @@
 import time
 from collections import defaultdict
-from typing import List, Dict
+from typing import List, Dict, Mapping, Tuple
 
-from data.queststion_conf import QUESTIONS
+from config import DEFAULT_QUIZ
+from data.quiz import Quiz, quizzes
 from data.table.models import Question
 
+# Сколько секунд после окончания таймера ещё принимается ответ (задержка сети и нажатия)
+ANSWER_GRACE = 2
+
 
 class QuestionObject:
-    def __init__(self, id: int, data: dict):
-        self.id = id
-        self.categories: List[str] = data['categories']
-        self.question_type = data['question_type']
-        self.question = data['question']
-        self.images = data['images']
-        self.answer_images = data['answer_images']
-        self.answers = data['answers']
-        self.correct_answers = data['correct_answers']
-        self.score = data['score']
-        self.timer = data['timer']
-
-        self._time_start: float | None = 0
+    """Вопрос в одной игре: общие для всех игр данные из квиза и свой таймер."""
+
+    def __init__(self, model: Question, static: dict):
+        self.id = model.id
+        self.categories: List[str] = model.categories
+        self.question_type = model.question_type
+        self.question = model.question
+        self.images = model.images
+        self.answer_images = model.answer_images
+        self.answers = model.answers
+        self.correct_answers = model.correct_answers
+        self.score = model.score
+        self.timer = model.timer
+
+        # Момент окончания по time.monotonic(); 0 - вопрос ещё не показывали, времени на него нет
+        self._deadline: float | None = 0
+        # Оставшееся время, пока таймер на паузе
+        self._paused_left: float | None = None
+        # Время на ответ (с ANSWER_GRACE) вышло: ставит Game.close_question, снимает новый отсчёт таймера
+        self.closed = False
+
+        # Статичная часть вопроса не меняется за игру, между отправками меняется только time_left
+        self._model = model
+        self._static = static
 
     def start_timer(self):
-        self._time_start = time.time()
+        self.restore_timer(self.timer)
+
+    def restore_timer(self, time_left: float, paused: bool = False):
+        """Продолжить таймер с time_left секунд (на паузе, если paused).
+
+        Единственный способ изменить идущий таймер: пауза, продолжение и продление - Game.set_timer.
+        """
+        if paused:
+            self._deadline, self._paused_left = None, time_left
+        else:
+            self._deadline, self._paused_left = time.monotonic() + time_left, None
+        self.closed = False
+
+    @property
+    def paused(self) -> bool:
+        return self._paused_left is not None
+
+    @property
+    def timer_state(self) -> Tuple[float | None, float | None, bool]:
+        """Меняется только при запуске, паузе, продлении таймера и закрытии вопроса, но не с течением времени."""
+        return self._deadline, self._paused_left, self.closed
+
+    @property
+    def deadline(self) -> float | None:
+        """Время окончания по часам сервера (time.time()), None - таймер не идёт."""
+        if self._paused_left is not None or not self._deadline:
+            return None
+        return time.time() + (self._deadline - time.monotonic())
 
     @property
     def time_left(self):
-        if self._time_start is None:
+        if self._paused_left is not None:
+            return self._paused_left
+        if self._deadline is None:
             return self.timer
-        t = self._time_start + self.timer - time.time()
+        t = self._deadline - time.monotonic()
         if t < 0:
             return 0
         return t
 
-    def time_left_with_gap(self, gap=2):
-        if self._time_start is None:
+    def time_left_with_gap(self, gap=ANSWER_GRACE):
+        if self._paused_left is not None:
+            return self._paused_left + gap
+        if self._deadline is None:
             return self.timer
-        t = self.timer - (time.time() - self._time_start) + gap
+        t = self._deadline - time.monotonic() + gap
         if t < 0:
             return 0
         return t
 
     def get_model(self) -> Question:
-        return Question.model_validate(self, from_attributes=True)
+        return self._model.model_copy(update={'time_left': self.time_left, 'closed': self.closed})
 
     def model_dump(self) -> dict:
-        return self.get_model().model_dump(mode='json')
+        return {**self._static, 'time_left': self.time_left, 'closed': self.closed}
 
 
 class LastQuestionError(Exception):
@@ -54,13 +100,42 @@ class LastQuestionError(Exception):
 
 
 class QuestionManager:
-    def __init__(self):
-        self.questions: List[QuestionObject] = [QuestionObject(i, q) for i, q in enumerate(QUESTIONS)]
-        self.categories: Dict[str, List[QuestionObject]] = defaultdict(list)
-        for question in self.questions:
-            for category in question.categories:
-                self.categories[category].append(question)
+    def __init__(self, quiz: Quiz | None = None):
+        self.quiz = quiz if quiz is not None else quizzes.get(DEFAULT_QUIZ)
+        self.questions: List[QuestionObject] = []
+        # Категория -> id вопросов, индекс общий из квиза
+        self.categories: Mapping[str, Tuple[int, ...]] = self.quiz.categories
         self.__current_index: int | None = None
+        self.load()
+
+    def load(self):
+        """Начать квиз заново: у вопросов новые таймеры, данные вопросов общие из квиза."""
+        self.questions = [QuestionObject(model, static) for model, static in zip(self.quiz.questions, self.quiz.static)]
+        self.categories = self.quiz.categories
+        self.__current_index = None
+        # Все вопросы для итогов столов и состояние таймеров, для которого они собраны
+        self._results_questions: Tuple[tuple, List[dict]] | None = None
+
+    def results_questions(self) -> List[dict]:
+        """Вопросы для итогов стола (ToTableResult.questions): общий список, пока таймеры не запускали заново.
+
+        time_left в нём - на момент сборки: в итогах таймер последнего вопроса может ещё идти, и иначе
+        каждая рассылка итогов была бы новой версией состояния стола.
+        """
+        timers = tuple(question.timer_state for question in self.questions)
+        if self._results_questions is None or self._results_questions[0] != timers:
+            self._results_questions = (timers, [question.model_dump() for question in self.questions])
+        return self._results_questions[1]
+
+    @property
+    def current_index(self) -> int | None:
+        return self.__current_index
+
+    def restore(self, index: int | None, time_left: float | None = None, paused: bool = False):
+        """Перейти к вопросу index, продолжив его таймер с time_left."""
+        self.__current_index = index
+        if index is not None and time_left is not None:
+            self.questions[index].restore_timer(time_left, paused)
 
     @property
     def current_question(self) -> QuestionObject | None:
@@ -89,6 +164,15 @@ class Result:
         self.question_score: Dict[int, float] = defaultdict(lambda: 0)
         self.categories: Dict[str, float] = defaultdict(lambda: 0)
 
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Result':
+        """Восстановить результат из данных Table.get_full_table_data()."""
+        result = cls()
+        result.answers = {int(k): list(v) for k, v in data["answers"].items()}
+        result.question_score.update({int(k): v for k, v in data["question_score"].items()})
+        result.categories.update(data["categories"])
+        return result
+
     @staticmethod
     def f1_score_based_points(correct_answers, user_answers, max_points) -> float:
         A = set(correct_answers)
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import sqlite3
+from types import MappingProxyType
+from typing import Callable, Dict, List, Mapping, Tuple
+
+from config import QUIZ_DIR
+from data.images import images
+from data.log import get_logger
+from data.queststion_conf import QUESTIONS
+from data.table.models import Question
+
+try:
+    import yaml
+except ImportError:  # YAML-квизы необязательны
+    yaml = None
+
+log = get_logger(__name__)
+
+# Квиз из data/queststion_conf.py, доступен всегда
+BUILTIN_QUIZ = "default"
+QUIZ_EXTENSIONS = (".json", ".yaml", ".yml", ".sqlite", ".db")
+# Поля вопроса, которые в таблице SQLite хранятся как JSON
+SQLITE_JSON_FIELDS = ("categories", "images", "answer_images", "answers", "correct_answers")
+# Поля вопроса, которые меняются по ходу игры (QuestionObject), а не задаются квизом
+GAME_FIELDS = {"time_left", "closed"}
+
+
+class Quiz:
+    """Проверенный и проиндексированный набор вопросов. Не меняется после создания и общий для всех игр."""
+
+    def __init__(self, name: str, questions: List[Question], mtime: float | None = None):
+        self.name = name
+        self.mtime = mtime
+        self.questions: Tuple[Question, ...] = tuple(questions)
+        # Сериализованные вопросы без полей игры, их нельзя менять: они общие для всех игр
+        self.static: Tuple[dict, ...] = tuple(q.model_dump(mode='json', exclude=GAME_FIELDS) for q in questions)
+        categories: Dict[str, List[int]] = {}
+        for question in self.questions:
+            for category in question.categories:
+                categories.setdefault(category, []).append(question.id)
+        self.categories: Mapping[str, Tuple[int, ...]] = MappingProxyType(
+            {category: tuple(ids) for category, ids in categories.items()}
+        )
+
+    def __len__(self):
+        return len(self.questions)
+
+    @classmethod
+    def from_dicts(
+            cls,
+            name: str,
+            data: List[dict],
+            mtime: float | None = None,
+            srcset: Callable[[str], str | None] | None = None,
+    ) -> 'Quiz':
+        """Проверить вопросы; srcset - для картинок, у которых есть уменьшенные копии."""
+        questions = []
+        for i, item in enumerate(data):
+            if srcset is not None:
+                item = {
+                    **item,
+                    'images_srcset': [srcset(url) for url in item.get('images', [])],
+                    'answer_images_srcset': [srcset(url) for url in item.get('answer_images', [])],
+                }
+            try:
+                question = Question.model_validate({**item, 'id': i, 'time_left': item['timer']})
+            except (KeyError, ValueError) as e:
+                raise ValueError(f'Quiz "{name}", question {i + 1}: {e}') from e
+            if not question.answers or any(not 0 <= a < len(question.answers) for a in question.correct_answers):
+                raise ValueError(f'Quiz "{name}", question {i + 1}: correct_answers out of range')
+            questions.append(question)
+        return cls(name, questions, mtime)
+
+
+def read_quiz_file(path: str) -> List[dict]:
+    """Прочитать вопросы из JSON, YAML (нужен PyYAML) или SQLite (таблица questions)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".json":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    elif ext in (".yaml", ".yml"):
+        if yaml is None:
+            raise ValueError(f"PyYAML is required to load {path}")
+        with open(path, encoding="utf-8") as f:
+            data = yaml.safe_load(f)
+    elif ext in (".sqlite", ".db"):
+        connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            connection.row_factory = sqlite3.Row
+            rows = connection.execute("SELECT * FROM questions ORDER BY position").fetchall()
+        finally:
+            connection.close()
+        data = []
+        for row in rows:
+            item = {key: row[key] for key in row.keys() if key != "position"}
+            for field in SQLITE_JSON_FIELDS:
+                if item.get(field) is not None:
+                    item[field] = json.loads(item[field])
+            data.append(item)
+    else:
+        raise ValueError(f"Unknown quiz format: {path}")
+    # Вопросы списком или {"questions": [...]}
+    if isinstance(data, dict):
+        data = data.get("questions")
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of questions")
+    return data
+
+
+class QuizStore:
+    """Квизы из файлов папки directory (имя квиза - имя файла без расширения) и встроенный квиз.
+
+    Файл перечитывается при следующем обращении, если изменилось его время модификации. Игры,
+    которые уже идут, остаются на своей копии квиза до сброса.
+
+    Загрузка квиза делает уменьшенные копии его картинок (Pillow), поэтому с event loop квизы загружаются
+    через aget, а при старте - все сразу через preload в отдельном потоке.
+    """
+
+    def __init__(self, directory: str = ""):
+        self.directory = directory
+        self._builtin: Quiz | None = None
+        self._quizzes: Dict[str, Quiz] = {}
+
+    @property
+    def builtin(self) -> Quiz:
+        if self._builtin is None:
+            self._builtin = Quiz.from_dicts(BUILTIN_QUIZ, QUESTIONS, srcset=images.srcset)
+        return self._builtin
+
+    def _path(self, name: str) -> str | None:
+        if not self.directory or os.sep in name or name.startswith("."):
+            return None
+        for ext in QUIZ_EXTENSIONS:
+            path = os.path.join(self.directory, name + ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def get(self, name: str = BUILTIN_QUIZ) -> Quiz:
+        path = self._path(name)
+        quiz = self._quizzes.get(name)
+        if path is None:
+            # Файл квиза с именем встроенного подменяет его, пока лежит в папке
+            self._quizzes.pop(name, None)
+            if name == BUILTIN_QUIZ:
+                return self.builtin
+            raise ValueError(f'Unknown quiz "{name}"')
+
+        mtime = os.stat(path).st_mtime
+        if quiz is not None and quiz.mtime == mtime:
+            return quiz
+        try:
+            quiz = Quiz.from_dicts(name, read_quiz_file(path), mtime, srcset=images.srcset)
+        except (OSError, ValueError, sqlite3.Error) as e:
+            # Ошибка в отредактированном файле не должна ломать новые игры: остаётся прошлая версия
+            if quiz is None:
+                raise ValueError(f'Cannot load quiz "{name}": {e}') from e
+            log.warning("quiz_reload_failed", quiz=name, error=str(e))
+            return quiz
+        self._quizzes[name] = quiz
+        return quiz
+
+    async def aget(self, name: str = BUILTIN_QUIZ) -> Quiz:
+        """get в отдельном потоке: новый или изменённый файл квиза не останавливает все сокеты."""
+        return await asyncio.to_thread(self.get, name)
+
+    def preload(self):
+        """Загрузить все квизы и копии их картинок (при старте, в отдельном потоке)."""
+        for name in self.names():
+            try:
+                self.get(name)
+            except ValueError as e:
+                log.warning("quiz_load_failed", quiz=name, error=str(e))
+
+    def match(self, name: str, questions: List[dict]) -> Quiz:
+        """Квиз, на котором шла игра из снимка: из хранилища, если он не изменился, иначе из вопросов снимка."""
+        try:
+            quiz = self.get(name)
+        except ValueError:
+            quiz = None
+        static = [{k: v for k, v in q.items() if k not in GAME_FIELDS} for q in questions]
+        if quiz is None or list(quiz.static) != static:
+            quiz = Quiz.from_dicts(name, questions)
+        return quiz
+
+    def names(self) -> List[str]:
+        names = {BUILTIN_QUIZ}
+        if self.directory and os.path.isdir(self.directory):
+            names.update(
+                os.path.splitext(file)[0] for file in os.listdir(self.directory)
+                if file.lower().endswith(QUIZ_EXTENSIONS) and not file.startswith(".")
+            )
+        return sorted(names)
+
+
+# Общее хранилище квизов процесса
+quizzes = QuizStore(QUIZ_DIR)
@@ -0,0 +1,59 @@
+"""Ограничение частоты входящих событий столов: token bucket на тип события.
+
+Лимиты задаются строкой "from_set_table_answers=10/20,from_set_table_name=1/5,*=20/40": событие=в секунду/запас,
+"*" - для остальных типов (и нераспознанных кадров). Проверка идёт по типу из кадра (wire.event_type) до разбора
+события, поэтому лишнее сообщение отбрасывается почти даром.
+"""
+import time
+from typing import Dict, Tuple
+
+ANY_EVENT = "*"
+
+
+def parse_limits(value: str) -> Dict[str, Tuple[float, float]]:
+    """"from_set_table_name=1/5,*=20/40" -> событие -> (в секунду, запас). Без запаса он равен частоте."""
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        event, limit = item.split("=", 1)
+        rate, _, burst = limit.partition("/")
+        limits[event.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class RateLimiter:
+    """Корзины одного подключения или стола; типы без лимита (и без "*") не ограничиваются."""
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]]):
+        self.limits = limits
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    def allow(self, event_type: str) -> bool:
+        # Типы без своего лимита делят одну корзину: новые выдуманные типы не дают новых токенов
+        key = event_type if event_type in self.limits else ANY_EVENT
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self.limits.get(key)
+            if limit is None:
+                return True
+            bucket = self._buckets[key] = TokenBucket(*limit)
+        return bucket.take(time.monotonic())
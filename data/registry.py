@@ -0,0 +1,147 @@
+import asyncio
+import re
+import sys
+import time
+import types
+from typing import Dict, List
+
+from fastapi import WebSocket
+
+from config import DEFAULT_QUIZ
+from data.backend import StateBackend
+from data.journal import Journal, JournalWriter
+from data.obj import Game
+from data.quiz import Quiz, quizzes
+
+GAME_CODE_RE = re.compile(r"^[A-Za-z0-9_-]{1,32}$")
+# Коды, которые совпадают с сегментами старых адресов /ws/table, /ws/screen, /ws/admin
+RESERVED_CODES = {"table", "screen", "admin"}
+
+# Сокеты, код и общие для всех игр процесса объекты: бэкенд, писатель журнала, event loop
+_SKIP_SIZEOF = (
+    WebSocket, type, types.ModuleType, types.FunctionType, types.MethodType, asyncio.Task,
+    asyncio.AbstractEventLoop, StateBackend, JournalWriter,
+)
+
+
+def deep_sizeof(obj, seen: set | None = None) -> int:
+    """Приблизительный размер объекта вместе со всем, на что он ссылается (без сокетов и модулей)."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or isinstance(obj, _SKIP_SIZEOF):
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+class GameRegistry:
+    """Все игры процесса по коду игры. Игры создаются при первом подключении и удаляются после простоя."""
+
+    def __init__(
+            self,
+            backend: StateBackend,
+            idle_timeout: float,
+            max_games: int,
+            pinned: tuple[str, ...] = (),
+            journal_writer: JournalWriter | None = None,
+            journal_dir: str = "",
+            snapshot_every: int = 500,
+            sync_timeout: float = 1.0,
+    ):
+        self.backend = backend
+        self.sync_timeout = sync_timeout
+        self.journal_writer = journal_writer
+        self.journal_dir = journal_dir
+        self.snapshot_every = snapshot_every
+        self.idle_timeout = idle_timeout
+        self.max_games = max_games
+        self.pinned = set(pinned)
+        self.games: Dict[str, Game] = {}
+
+    async def get(self, code: str) -> Game:
+        if code not in self.games:
+            if not GAME_CODE_RE.match(code) or code in RESERVED_CODES:
+                raise ValueError(f'Invalid game code "{code}"')
+            # Квиз новой игры загружается в отдельном потоке, Game() берёт его уже из хранилища
+            await quizzes.aget(DEFAULT_QUIZ)
+        game = self.games.get(code)
+        if game is None:
+            if len(self.games) >= self.max_games:
+                raise ValueError("Too many games")
+            journal = None
+            if self.journal_writer is not None:
+                journal = Journal(self.journal_writer, self.journal_dir, code, self.snapshot_every)
+            game = self.games[code] = Game(code, self.backend, journal)
+            # Игра может идти в других процессах, их состояние новее журнала; журнал - если никто не ответил
+            if not await game.sync_from_peers(self.sync_timeout):
+                await game.restore()
+        game.touch()
+        return game
+
+    async def on_message(self, code: str, message: dict):
+        """Изменение игры из другого процесса. Игры, которых здесь нет, получат состояние при создании."""
+        game = self.games.get(code)
+        if game is not None:
+            await game.apply_remote(message)
+
+    async def on_reconnect(self):
+        """Связь с общим бэкендом восстановлена: изменения других процессов за время обрыва потеряны."""
+        for game in list(self.games.values()):
+            await game.resync()
+
+    def evict_idle(self) -> List[str]:
+        """Удалить игры без подключений, простаивающие дольше idle_timeout."""
+        now = time.monotonic()
+        evicted = [
+            code for code, game in self.games.items()
+            if code not in self.pinned
+            and game.connections_count() == 0
+            and now - game.last_activity > self.idle_timeout
+        ]
+        for code in evicted:
+            game = self.games.pop(code)
+            game.cancel_timer()
+            if game.journal is not None:
+                game.journal.close()
+        return evicted
+
+    async def run_eviction(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.evict_idle()
+
+    async def run_pings(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            for game in self.games.values():
+                game.ping_clients()
+
+    def stats(self) -> Dict[str, dict]:
+        """memory - память самой игры; квиз общий у игр с тем же квизом, его размер - quiz_memory."""
+        now = time.monotonic()
+        # Квиз (и его вопросы, на которые ссылаются вопросы игры) считается один раз на квиз
+        quizzes: Dict[int, tuple[int, set]] = {}
+        stats = {}
+        for code, game in self.games.items():
+            quiz: Quiz = game.question_manager.quiz
+            if id(quiz) not in quizzes:
+                quiz_seen: set = set()
+                quizzes[id(quiz)] = (deep_sizeof(quiz, quiz_seen), quiz_seen)
+            quiz_memory, quiz_seen = quizzes[id(quiz)]
+            stats[code] = {
+                "state": game.state.value,
+                "tables": len(game.tables),
+                "connections": game.connections_count(),
+                "idle": round(now - game.last_activity, 1),
+                "memory": deep_sizeof(game, set(quiz_seen)),
+                "quiz": quiz.name,
+                "quiz_memory": quiz_memory,
+            }
+        return stats
@@ -0,0 +1,77 @@
+from typing import Annotated, Any, Callable, Dict, List, Type, Union
+
+from pydantic import Field, TypeAdapter, ValidationError
+from pydantic_core import PydanticCustomError
+
+from data import wire
+from data.table.events import BaseWsEvent
+
+
+class EventRouter:
+    """Входящие события одного вида клиентов: модели и обработчики по event_type.
+
+    Собирается один раз на класс клиента декоратором on. Кадр разбирается и проверяется сразу из текста
+    (pydantic-core validate_json) в модель по event_type, без промежуточного dict.
+    """
+
+    def __init__(self):
+        # event_type -> обработчик (метод класса клиента, принимает модель события)
+        self.handlers: Dict[str, Callable] = {}
+        self.models: List[Type[BaseWsEvent]] = []
+        self._adapter: TypeAdapter | None = None
+
+    def on(self, model: Type[BaseWsEvent]):
+        def decorator(handler: Callable) -> Callable:
+            self.handlers[model.model_fields["event_type"].default] = handler
+            self.models.append(model)
+            self._adapter = None
+            return handler
+        return decorator
+
+    @property
+    def adapter(self) -> TypeAdapter:
+        if self._adapter is None:
+            union = Union[tuple(self.models)] if len(self.models) > 1 else self.models[0]
+            self._adapter = TypeAdapter(Annotated[union, Field(discriminator="event_type")])
+        return self._adapter
+
+    def decode(self, frame: str | bytes | dict, binary: bool = False) -> BaseWsEvent:
+        """Событие из кадра: JSON-текст, MessagePack или уже разобранный dict. ValidationError - ошибка в кадре.
+
+        binary - сокет договорился о подпротоколе MessagePack; без него бинарный кадр - ошибка.
+        """
+        if isinstance(frame, str):
+            return self.adapter.validate_json(frame)
+        if isinstance(frame, bytes):
+            return self.adapter.validate_python(self._unpack(frame, binary))
+        return self.adapter.validate_python(frame)
+
+    @staticmethod
+    def _unpack(frame: bytes, binary: bool) -> Any:
+        # Битый кадр - такая же ошибка в сообщении, как неверный JSON, а не исключение из цикла сокета
+        if not binary or wire.msgpack is None:
+            raise _frame_error(frame, "Binary frames need the %s subprotocol" % wire.SUBPROTOCOL_MSGPACK)
+        try:
+            return wire.unpack(frame)
+        except (wire.msgpack.UnpackException, ValueError, TypeError, IndexError) as e:
+            raise _frame_error(frame, "Invalid MessagePack: %s" % e)
+
+    async def dispatch(self, client: Any, event: BaseWsEvent):
+        await self.handlers[event.event_type](client, event)
+
+
+def _frame_error(frame: bytes, message: str) -> ValidationError:
+    error = PydanticCustomError("frame_invalid", "{error}", {"error": message})
+    return ValidationError.from_exception_data("EventRouter", [{"type": error, "loc": (), "input": frame}])
+
+
+def describe_error(error: ValidationError) -> str:
+    """Короткое сообщение клиенту: неизвестный тип события или первое неверное поле."""
+    details = error.errors(include_url=False)
+    first = details[0] if details else {}
+    if first.get("type") == "union_tag_invalid":
+        return f'Unknown event type "{first["ctx"]["tag"]}"'
+    if first.get("type") == "union_tag_not_found":
+        return 'Unknown event type "None"'
+    location = ".".join(str(part) for part in first.get("loc", ())[1:])
+    return f'{location}: {first.get("msg")}' if location else str(first.get("msg", error))
@@ -0,0 +1,172 @@
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Tuple
+
+from starlette.responses import Response
+
+from data.images import DERIVED_DIR
+from data.log import get_logger
+
+try:
+    import brotli
+except ImportError:  # br-варианты необязательны, без пакета отдаётся gzip
+    brotli = None
+
+log = get_logger(__name__)
+
+# Папки, файлы в которых можно кэшировать навсегда: их содержимое не меняется без смены имени. Это сборка Vite
+# (assetsDir: "static/assets", имена с хэшем) и копии картинок data/images.py с хэшем содержимого. Файлы из
+# frontend/public/static (логотип, картинки квиза) лежат в самой static/ и заменяются под тем же именем.
+ASSETS_DIR = "assets"
+IMMUTABLE_DIRS = (f"static/{ASSETS_DIR}/", f"static/{DERIVED_DIR}/")
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+# Сжатый вариант хранится, только если он хотя бы на столько меньше исходного
+MIN_COMPRESSION_GAIN = 0.9
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+class StaticFile:
+    """Файл сборки: strong ETag по содержимому и заранее сжатые варианты."""
+
+    def __init__(self, path: str, data: bytes, mtime: float):
+        self.path = path
+        self.size = len(data)
+        self.mtime = mtime
+        self.etag = '"%s"' % hashlib.sha256(data).hexdigest()[:32]
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.immutable = path.startswith(IMMUTABLE_DIRS)
+        # Кодировка (br, gzip) -> сжатое содержимое
+        self.variants: Dict[str, bytes] = {}
+        if self.content_type.startswith(COMPRESSIBLE_TYPES):
+            self._compress(data)
+
+    def _compress(self, data: bytes):
+        candidates = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            candidates["br"] = brotli.compress(data)
+        for encoding, compressed in candidates.items():
+            if len(compressed) < len(data) * MIN_COMPRESSION_GAIN:
+                self.variants[encoding] = compressed
+
+
+class StaticAssets:
+    """Раздача сборки фронтенда и картинок квиза из памяти.
+
+    При старте (scan) файлы читаются один раз: считаются ETag и gzip/br-варианты. Содержимое горячих
+    файлов держится в LRU до cache_bytes, чтобы картинку ответа, которую одновременно запрашивают все
+    телефоны, не читать с диска на каждый запрос. Файлы, добавленные или изменённые после старта, и вытесненные
+    из LRU читаются (и сжимаются) в отдельном потоке, не на event loop.
+    """
+
+    def __init__(self, directory: str, cache_bytes: int = 64 * 1024 * 1024, max_age: int = 300):
+        self.directory = os.path.realpath(directory)
+        self.cache_bytes = cache_bytes
+        self.max_age = max_age
+        self.files: Dict[str, StaticFile] = {}
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._cached_bytes = 0
+
+    def scan(self):
+        if not os.path.isdir(self.directory):
+            log.warning("static_dir_missing", directory=self.directory)
+            return
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                self._load(os.path.relpath(os.path.join(root, name), self.directory).replace(os.sep, "/"))
+
+    def _full_path(self, path: str) -> str | None:
+        full_path = os.path.realpath(os.path.join(self.directory, path))
+        if os.path.commonpath([full_path, self.directory]) != self.directory or not os.path.isfile(full_path):
+            return None
+        return full_path
+
+    def _read_file(self, path: str) -> Tuple[StaticFile, bytes] | None:
+        """Прочитать файл и посчитать ETag и сжатые варианты. Не трогает общее состояние: можно из потока."""
+        full_path = self._full_path(path)
+        if full_path is None:
+            return None
+        with open(full_path, "rb") as f:
+            data = f.read()
+        return StaticFile(path, data, os.path.getmtime(full_path)), data
+
+    def _store(self, static_file: StaticFile, data: bytes) -> StaticFile:
+        self.files[static_file.path] = static_file
+        self._remember(static_file.path, data)
+        return static_file
+
+    def _load(self, path: str) -> StaticFile | None:
+        loaded = self._read_file(path)
+        return self._store(*loaded) if loaded is not None else None
+
+    def _remember(self, path: str, data: bytes):
+        if len(data) > self.cache_bytes // 4:
+            return
+        if path in self._cache:
+            self._cached_bytes -= len(self._cache.pop(path))
+        self._cache[path] = data
+        self._cached_bytes += len(data)
+        while self._cached_bytes > self.cache_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cached_bytes -= len(evicted)
+
+    async def get(self, path: str) -> StaticFile | None:
+        static_file = self.files.get(path)
+        if static_file is not None:
+            try:
+                mtime = os.path.getmtime(os.path.join(self.directory, path))
+            except OSError:
+                self.files.pop(path, None)
+                return None
+            if mtime == static_file.mtime:
+                return static_file
+        # Файл добавили или заменили после старта
+        loaded = await asyncio.to_thread(self._read_file, path)
+        return self._store(*loaded) if loaded is not None else None
+
+    async def read(self, static_file: StaticFile) -> bytes:
+        data = self._cache.get(static_file.path)
+        if data is not None:
+            self._cache.move_to_end(static_file.path)
+            return data
+        data = await asyncio.to_thread(_read_bytes, os.path.join(self.directory, static_file.path))
+        self._remember(static_file.path, data)
+        return data
+
+    async def response(
+            self, path: str, headers: Mapping[str, str], method: str = "GET", cache_control: str | None = None
+    ) -> Response:
+        static_file = await self.get(path)
+        if static_file is None:
+            return Response(status_code=404)
+
+        if cache_control is None:
+            cache_control = IMMUTABLE_CACHE_CONTROL if static_file.immutable else f"public, max-age={self.max_age}"
+        response_headers = {"etag": static_file.etag, "cache-control": cache_control, "vary": "Accept-Encoding"}
+        if static_file.etag in _parse_list(headers.get("if-none-match", "")):
+            return Response(status_code=304, headers=response_headers)
+
+        accepted = _parse_list(headers.get("accept-encoding", ""))
+        encoding = next((e for e in ("br", "gzip") if e in accepted and e in static_file.variants), None)
+        if encoding is not None:
+            body = static_file.variants[encoding]
+            response_headers["content-encoding"] = encoding
+        else:
+            body = await self.read(static_file)
+        if method == "HEAD":
+            response_headers["content-length"] = str(len(body))
+            body = b""
+        return Response(body, headers=response_headers, media_type=static_file.content_type)
+
+
+def _read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _parse_list(value: str) -> List[str]:
+    """Значения заголовка через запятую без параметров (q=0 не поддерживается)."""
+    return [item.split(";")[0].strip() for item in value.split(",") if item.strip()]
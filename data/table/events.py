@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Literal
 
 from pydantic import BaseModel
 
@@ -18,33 +18,89 @@ class TableEvent(BaseWsEvent, TableData):
     result: ToTableResult | None = None
 
 
+class TablePatchEvent(BaseWsEvent):
+    """Изменения состояния стола относительно версии version - 1 (протокол с патчами)."""
+    event_type: str = "table_patch"
+    version: int
+    patch: List[dict]
+
+
+class TimerEvent(BaseWsEvent):
+    """Синхронизация таймера вопроса для столов и экранов: дальше клиенты отсчитывают время сами."""
+    event_type: str = "timer"
+    question_id: int
+    time_left: float
+    # Время окончания по часам сервера (unix time, секунды); клиент переводит в свои часы через смещение из clock
+    deadline: float | None = None
+    paused: bool
+    # Время вышло, ответы больше не принимаются
+    closed: bool
+
+
+class PingEvent(BaseWsEvent):
+    """Замер задержки: клиент сразу отвечает from_pong с тем же id и своим временем."""
+    event_type: str = "ping"
+    id: int
+    server_time: float
+
+
+class ClockEvent(BaseWsEvent):
+    """Оценка по последним ping: смещение часов клиента относительно сервера и RTT, секунды."""
+    event_type: str = "clock"
+    offset: float
+    rtt: float
+
+
 class ErrorEvent(BaseWsEvent):
     event_type: str = "error"
     error: str
 
 
+class ProfilesEvent(BaseWsEvent):
+    """Профили последних шагов ведущего (data/profiler.py): деревья span и они же в формате collapsed stacks."""
+    event_type: str = "profiles"
+    enabled: bool
+    profiles: List[dict]
+    folded: str
+
+
 # from client --------------------------------------------
 class FromClientEventTypes:
     from_set_table_name = "from_set_table_name"
     from_set_table_answers = "from_set_table_answers"
     from_answer_question = "from_answer_question"
+    from_resync = "from_resync"
+    from_pong = "from_pong"
 
 
 class FromSetTableNameEvent(BaseWsEvent):
-    event_type: str = FromClientEventTypes.from_set_table_name
+    event_type: Literal[FromClientEventTypes.from_set_table_name] = FromClientEventTypes.from_set_table_name
     table_name: str
 
 
 class FromSetTableAnswersEvent(BaseWsEvent):
-    event_type: str = FromClientEventTypes.from_set_table_answers
+    event_type: Literal[FromClientEventTypes.from_set_table_answers] = FromClientEventTypes.from_set_table_answers
     table_answers: List[int]
 
 
 class FromAnswerQuestionEvent(BaseWsEvent):
-    event_type: str = FromClientEventTypes.from_answer_question
+    event_type: Literal[FromClientEventTypes.from_answer_question] = FromClientEventTypes.from_answer_question
     table_answers: List[int]
 
 
+class FromResyncEvent(BaseWsEvent):
+    """Клиент пропустил версию и просит полное состояние (стол и экран)."""
+    event_type: Literal[FromClientEventTypes.from_resync] = FromClientEventTypes.from_resync
+
+
+class FromPongEvent(BaseWsEvent):
+    """Ответ на ping (столы и экраны)."""
+    event_type: Literal[FromClientEventTypes.from_pong] = FromClientEventTypes.from_pong
+    id: int
+    # Время клиента в момент ответа (unix time, секунды)
+    client_time: float
+
+
 # from admin
 class FromAdminEventTypes:
     from_admin_resize_tables = "from_admin_resize_tables"
@@ -58,43 +114,75 @@ class FromAdminEventTypes:
 
     from_admin_next_step = "from_admin_next_step"
 
+    from_admin_pause_timer = "from_admin_pause_timer"
+    from_admin_resume_timer = "from_admin_resume_timer"
+    from_admin_extend_timer = "from_admin_extend_timer"
+
+    from_admin_set_profiling = "from_admin_set_profiling"
+    from_admin_get_profiles = "from_admin_get_profiles"
+
 
 class ResizeTablesEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_resize_tables
+    event_type: Literal[FromAdminEventTypes.from_admin_resize_tables] = FromAdminEventTypes.from_admin_resize_tables
     count: int
 
 
 class FromAdminChangeLeaderEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_change_leader
+    event_type: Literal[FromAdminEventTypes.from_admin_change_leader] = FromAdminEventTypes.from_admin_change_leader
     table_id: int
 
 
 class FromAdminStartGameEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_start_game
+    event_type: Literal[FromAdminEventTypes.from_admin_start_game] = FromAdminEventTypes.from_admin_start_game
 
 
 class FromAdminShowAnswersEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_show_answers
+    event_type: Literal[FromAdminEventTypes.from_admin_show_answers] = FromAdminEventTypes.from_admin_show_answers
 
 
 class FromAdminPreviousQuestionEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_previous_question
+    event_type: Literal[FromAdminEventTypes.from_admin_previous_question] = FromAdminEventTypes.from_admin_previous_question
 
 
 class FromAdminNextQuestionEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_next_question
+    event_type: Literal[FromAdminEventTypes.from_admin_next_question] = FromAdminEventTypes.from_admin_next_question
 
 
 class FromAdminResetGameEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_reset_game
+    event_type: Literal[FromAdminEventTypes.from_admin_reset_game] = FromAdminEventTypes.from_admin_reset_game
+    # Квиз для новой игры; без него остаётся текущий (перечитанный, если файл изменился)
+    quiz: str | None = None
 
 
 class FromAdminResultsEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_show_results
+    event_type: Literal[FromAdminEventTypes.from_admin_show_results] = FromAdminEventTypes.from_admin_show_results
 
 
 class FromAdminNextStepEvent(BaseWsEvent):
-    event_type: str = FromAdminEventTypes.from_admin_next_step
+    event_type: Literal[FromAdminEventTypes.from_admin_next_step] = FromAdminEventTypes.from_admin_next_step
+
+
+class FromAdminPauseTimerEvent(BaseWsEvent):
+    event_type: Literal[FromAdminEventTypes.from_admin_pause_timer] = FromAdminEventTypes.from_admin_pause_timer
+
+
+class FromAdminResumeTimerEvent(BaseWsEvent):
+    event_type: Literal[FromAdminEventTypes.from_admin_resume_timer] = FromAdminEventTypes.from_admin_resume_timer
+
+
+class FromAdminExtendTimerEvent(BaseWsEvent):
+    event_type: Literal[FromAdminEventTypes.from_admin_extend_timer] = FromAdminEventTypes.from_admin_extend_timer
+    # Сколько секунд добавить (отрицательное - убавить)
+    seconds: float
+
+
+class FromAdminSetProfilingEvent(BaseWsEvent):
+    event_type: Literal[FromAdminEventTypes.from_admin_set_profiling] = FromAdminEventTypes.from_admin_set_profiling
+    enabled: bool
+
+
+class FromAdminGetProfilesEvent(BaseWsEvent):
+    event_type: Literal[FromAdminEventTypes.from_admin_get_profiles] = FromAdminEventTypes.from_admin_get_profiles
 
 
 # to screen
@@ -107,6 +195,13 @@ class ScreenTablesStateEvent(BaseWsEvent):
     results: ScreenResults | None = None
 
 
+class ScreenPatchEvent(BaseWsEvent):
+    """Изменения состояния экрана относительно версии version - 1 (протокол с патчами)."""
+    event_type: str = "screen_patch"
+    version: int
+    patch: List[dict]
+
+
 class ScreenTableAnsweredEvent(BaseWsEvent):
     event_type: str = "screen_table_answered"
     table_id: int
@@ -47,11 +47,16 @@ class Question(BaseModel):
     question: str
     images: List[str] = []
     answer_images: List[str] = []
+    # srcset для каждой картинки из images / answer_images: уменьшенные копии для телефонов и исходник
+    images_srcset: List[str | None] = []
+    answer_images_srcset: List[str | None] = []
     answers: List[str]
     correct_answers: List[int]
     score: float
     timer: float
     time_left: float
+    # Время на ответ (с ANSWER_GRACE) вышло, ответы не принимаются
+    closed: bool = False
 
 
 class TableResult(BaseModel):
@@ -0,0 +1,175 @@
+import json
+import re
+from typing import Any, Dict, List, Tuple
+
+from pydantic import BaseModel
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from data.table.models import ClientRole
+
+try:
+    import orjson
+except ImportError:  # без orjson сериализует стандартный json
+    orjson = None
+
+
+def dumps(data: Any) -> str:
+    """Сериализовать данные в тот же формат, что и WebSocket.send_json."""
+    if orjson is not None:
+        # Ключи-числа (id столов, номера вопросов) json превращает в строки, orjson - только с этой опцией
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS).decode()
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def dumps_model(model: BaseModel) -> str:
+    """Сериализовать событие сразу из модели (pydantic-core), без промежуточного dict."""
+    return model.__pydantic_serializer__.to_json(model).decode()
+
+
+def with_role(body: str, role: ClientRole) -> str:
+    """Подставить поле role в уже сериализованное событие стола."""
+    return '{"role":"%s",%s' % (role.value, body[1:])
+
+
+def with_version(body: str, version: int) -> str:
+    """Добавить номер версии состояния в уже сериализованное событие."""
+    return '%s,"version":%d}' % (body[:-1], version)
+
+
+# Бинарный формат для телефонов: MessagePack с номерами вместо имён полей. Клиент выбирает его подпротоколом
+# WebSocket; состояние и патчи стола и экрана приходят бинарными кадрами, остальные события - JSON-текстом.
+try:
+    import msgpack
+except ImportError:  # без msgpack подпротокол не предлагается, все клиенты получают JSON
+    msgpack = None
+
+SUBPROTOCOL_MSGPACK = "quiz.msgpack.v1"
+ENCODING_JSON = "json"
+ENCODING_MSGPACK = "msgpack"
+
+# Номер поля - индекс в списке. Список только дополняется: номера зашиты в клиентах подпротокола v1
+FIELDS = (
+    "event_type", "role", "version", "patch", "op", "path", "value",
+    "table_id", "table_name", "table_state", "clients", "table_answers", "answered", "question", "result",
+    "id", "categories", "question_type", "images", "answer_images", "images_srcset", "answer_images_srcset",
+    "answers", "correct_answers", "score", "timer", "time_left",
+    "question_score", "questions", "place", "place_categories", "place_amount",
+    "game_state", "tables", "results", "winers", "category_winners",
+    "closed",
+)
+FIELD_IDS = {name: i for i, name in enumerate(FIELDS)}
+
+
+def negotiate(subprotocols: list) -> str | None:
+    """Подпротокол из предложенных клиентом, который поддерживает сервер."""
+    if msgpack is not None and SUBPROTOCOL_MSGPACK in subprotocols:
+        return SUBPROTOCOL_MSGPACK
+    return None
+
+
+def _compact(value: Any) -> Any:
+    # Ключи данных (категории, номера вопросов) остаются строками, поэтому число-ключ всегда означает поле
+    if isinstance(value, dict):
+        return {FIELD_IDS.get(k, k): _compact(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_compact(v) for v in value]
+    return value
+
+
+def _expand(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {FIELDS[k] if isinstance(k, int) else k: _expand(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_expand(v) for v in value]
+    return value
+
+
+def pack(data: dict) -> bytes:
+    return msgpack.packb(_compact(data))
+
+
+def unpack(frame: bytes) -> Any:
+    return _expand(msgpack.unpackb(frame, strict_map_key=False))
+
+
+def pack_state(state: dict, role: ClientRole | None = None, version: int | None = None) -> bytes:
+    """Состояние (без role) в MessagePack, с role и номером версии, как with_role / with_version для JSON."""
+    data = {"role": role.value, **state} if role is not None else dict(state)
+    if version is not None:
+        data["version"] = version
+    return pack(data)
+
+
+async def receive_frame(websocket: WebSocket) -> str | bytes:
+    """Принять кадр клиента как есть: JSON-текст или MessagePack. Разбирает его EventRouter клиента."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    if message.get("bytes") is not None:
+        return message["bytes"]
+    return message["text"]
+
+
+# Входящие кадры могут быть с пробелами (json.dumps по умолчанию), исходящие - компактные
+EVENT_TYPE_RE = re.compile(r'"event_type"\s*:\s*"([^"\\]*)"')
+
+
+def event_type(frame: str | bytes) -> str:
+    """Тип события из начала сериализованного кадра, без разбора всего сообщения."""
+    if isinstance(frame, bytes):
+        if msgpack is None:
+            return "unknown"
+        unpacker = msgpack.Unpacker(strict_map_key=False)
+        unpacker.feed(frame)
+        try:
+            # Поля разбираются по одному до event_type: он идёт раньше больших question и result.
+            # Клиент может прислать и обычный строковый ключ, router.decode принимает оба
+            for _ in range(unpacker.read_map_header()):
+                key, value = unpacker.unpack(), unpacker.unpack()
+                if key == FIELD_IDS["event_type"] or key == "event_type":
+                    # Под ключом может оказаться что угодно: не строка - такой же неизвестный тип
+                    return value if isinstance(value, str) else "unknown"
+        except (msgpack.OutOfData, msgpack.UnpackException, ValueError):
+            pass
+        return "unknown"
+    # В строковых значениях кавычки экранированы, поэтому совпадение - только само поле
+    match = EVENT_TYPE_RE.search(frame)
+    return match.group(1) if match else "unknown"
+
+
+class WireStats:
+    """Счётчики отправленных сообщений по типам событий: сообщений и байт, переданных транспорту.
+
+    Сжатие - permessage-deflate uvicorn (--ws-per-message-deflate), оно общее для сервера и приложению не видно:
+    размеры здесь до сжатия, сжатый трафик считается на прокси или балансировщике.
+    """
+
+    def __init__(self):
+        # event_type -> [сообщений, байт]
+        self.counters: Dict[str, List[int]] = {}
+        # Размер последнего большого кадра в байтах: его отправляют многим сокетам подряд
+        self._last: Tuple[str | bytes, str, int] | None = None
+
+    def record(self, frame: str | bytes):
+        last = self._last
+        if last is not None and last[0] is frame:
+            _, kind, size = last
+        else:
+            kind = event_type(frame)
+            size = len(frame) if isinstance(frame, bytes) or frame.isascii() else len(frame.encode())
+            self._last = (frame, kind, size)
+        counter = self.counters.get(kind)
+        if counter is None:
+            counter = self.counters[kind] = [0, 0]
+        counter[0] += 1
+        counter[1] += size
+
+    def snapshot(self) -> Dict[str, dict]:
+        return {
+            kind: {"messages": messages, "bytes": size}
+            for kind, (messages, size) in sorted(self.counters.items())
+        }
+
+
+# Общие счётчики процесса
+stats = WireStats()
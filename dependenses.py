@@ -1,7 +1,12 @@
+from fastapi import WebSocketException, status
 from starlette.websockets import WebSocket
 
+from config import DEFAULT_GAME
 from data.obj import Game
 
 
-async def ws_get_game(websocket: WebSocket) -> Game:
-    return websocket.app.state.game
+async def ws_get_game(websocket: WebSocket, game_code: str = DEFAULT_GAME) -> Game:
+    try:
+        return await websocket.app.state.games.get(game_code)
+    except ValueError as e:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
@@ -12,6 +12,7 @@ export interface Question {
   score: number;
   timer: number;
   time_left: number;
+  closed?: boolean;
 }
 
 export interface TableData {
@@ -30,7 +30,7 @@ export default function QuestionForm({
   const isAnswered = answered;
   const isMultiple = question.question_type === "multiple_choice";
   const isInAnswers = table_state === "in_answers";
-  const isBlocked = isTimeOver || isAnswered || isInAnswers || question.timer <= 0;
+  const isBlocked = isTimeOver || isAnswered || isInAnswers || question.closed || question.timer <= 0;
   const imgs = tableState.table_state === "in_answers" ? question.answer_images : question.images;
 
   const handleSelect = (idx: number) => {
@@ -6,7 +6,9 @@ export default defineConfig({
   base: '/',
   build: {
     outDir: 'dist',
-    assetsDir: 'static', // ассеты будут в dist/static
+    // Файлы сборки с хэшем в имени - в dist/static/assets: сервер кэширует навсегда только эту папку (data/static.py),
+    // а файлы из public/static лежат рядом в dist/static
+    assetsDir: 'static/assets',
     emptyOutDir: true,
   },
 })
@@ -1,30 +1,71 @@
+import asyncio
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, WebSocket, Depends, WebSocketDisconnect
-from starlette.responses import FileResponse
-from starlette.staticfiles import StaticFiles
-
-from data.obj import Game, AdminClient, ScreenClient
+from fastapi import FastAPI, WebSocket, Depends, WebSocketDisconnect, Request, Response, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from config import DEFAULT_GAME, GAME_IDLE_TIMEOUT, GAME_EVICT_INTERVAL, MAX_GAMES, STATE_BACKEND, JOURNAL_DIR, \
+    JOURNAL_FSYNC, JOURNAL_FSYNC_INTERVAL, JOURNAL_SNAPSHOT_EVERY, PING_INTERVAL, STATIC_DIR, STATIC_CACHE_BYTES, \
+    STATIC_MAX_AGE, METRICS_LOOP_LAG_INTERVAL, LOG_LEVEL, LOG_FORMAT, LOG_RATE, LOG_BURST, LOG_SAMPLE, SYNC_TIMEOUT
+from data import wire, metrics, log
+from data.backend import create_backend
+from data.journal import JournalWriter
+from data.obj import Game
+from data.quiz import quizzes
+from data.registry import GameRegistry
+from data.static import StaticAssets
 from dependenses import ws_get_game
 
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-    _app.state.game = Game()
+    # Логи пишет фоновый поток, event loop только кладёт записи в очередь
+    log_listener = log.setup(LOG_LEVEL, LOG_FORMAT, LOG_RATE, LOG_BURST, log.parse_sample(LOG_SAMPLE))
+    backend = create_backend(STATE_BACKEND)
+    journal_writer = JournalWriter(JOURNAL_FSYNC, JOURNAL_FSYNC_INTERVAL) if JOURNAL_DIR else None
+    _app.state.games = GameRegistry(
+        backend, GAME_IDLE_TIMEOUT, MAX_GAMES, pinned=(DEFAULT_GAME,),
+        journal_writer=journal_writer, journal_dir=JOURNAL_DIR, snapshot_every=JOURNAL_SNAPSHOT_EVERY,
+        sync_timeout=SYNC_TIMEOUT,
+    )
     _app.state.admin = None
+    # Квизы и уменьшенные копии их картинок (Pillow) - до первого подключения и не на event loop
+    await asyncio.to_thread(quizzes.preload)
+    # ETag и сжатые варианты считаются один раз при старте, уже вместе с копиями картинок
+    _app.state.static = StaticAssets(STATIC_DIR, STATIC_CACHE_BYTES, STATIC_MAX_AGE)
+    await asyncio.to_thread(_app.state.static.scan)
+    if journal_writer is not None:
+        journal_writer.start()
+    await backend.start(_app.state.games.on_message, _app.state.games.on_reconnect)
+    # Игра по умолчанию поднимается сразу, чтобы продолжиться с места падения
+    await _app.state.games.get(DEFAULT_GAME)
+    tasks = [asyncio.create_task(_app.state.games.run_eviction(GAME_EVICT_INTERVAL))]
+    if PING_INTERVAL > 0:
+        tasks.append(asyncio.create_task(_app.state.games.run_pings(PING_INTERVAL)))
+    if METRICS_LOOP_LAG_INTERVAL > 0:
+        tasks.append(asyncio.create_task(metrics.run_loop_lag(METRICS_LOOP_LAG_INTERVAL)))
     yield
+    for task in tasks:
+        task.cancel()
+    await backend.stop()
+    if journal_writer is not None:
+        await asyncio.to_thread(journal_writer.stop)
+    log_listener.stop()
 
 
 app = FastAPI(debug=True, lifespan=lifespan)
 
-
+# protocol=2: полное состояние при подключении, дальше только патчи к нему (data/patch.py)
 @app.websocket("/ws/table/{table_id}")
+@app.websocket("/ws/{game_code}/table/{table_id}")
 async def table_websocket(
         websocket: WebSocket,
         table_id: int,
+        protocol: int = 1,
         game: Game = Depends(ws_get_game)
 ):
-    await websocket.accept()
+    subprotocol = wire.negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=subprotocol)
 
     table = game.get_table(table_id)
     if table is None:
@@ -32,17 +73,24 @@ async def table_websocket(
         await websocket.close()
         return
 
-    client = await table.add_client(websocket)
+    encoding = wire.ENCODING_MSGPACK if subprotocol else wire.ENCODING_JSON
+    client = await table.add_client(websocket, protocol, encoding)
 
     try:
         while True:
-            data = await websocket.receive_json()
-            await client.ws_handler(data)
+            frame = await wire.receive_frame(websocket)
+            with metrics.handler_timer("table", frame):
+                await client.ws_handler(frame)
     except WebSocketDisconnect:
+        pass
+    finally:
+        # И при любой другой ошибке: иначе отключенный телефон так и останется лидером стола
+        client.outbox.stop()
         await table.remove_client(client)
 
 
 @app.websocket("/ws/admin")
+@app.websocket("/ws/{game_code}/admin")
 async def admin_websocket(
         websocket: WebSocket,
         game: Game = Depends(ws_get_game)
@@ -51,38 +99,103 @@ async def admin_websocket(
     #     await websocket.close(code=1008, reason="Already connected")
     #     return
 
-    admin = AdminClient(game, websocket)
+    admin = game.add_admin_client(websocket)
     # websocket.app.state.admin = admin
 
     await websocket.accept()
 
     try:
         while True:
-            data = await websocket.receive_json()
-            await admin.ws_handler(data)
+            frame = await wire.receive_frame(websocket)
+            with metrics.handler_timer("admin", frame):
+                await admin.ws_handler(frame)
     except WebSocketDisconnect:
         pass
+    finally:
+        game.remove_admin_client(admin)
 
 
 @app.websocket("/ws/screen")
+@app.websocket("/ws/{game_code}/screen")
 async def screen_websocket(
         websocket: WebSocket,
+        protocol: int = 1,
         game: Game = Depends(ws_get_game)
 ):
-    await websocket.accept()
-    screen = await game.add_screen_client(websocket)
+    subprotocol = wire.negotiate(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=subprotocol)
+    encoding = wire.ENCODING_MSGPACK if subprotocol else wire.ENCODING_JSON
+    screen = await game.add_screen_client(websocket, protocol, encoding)
     await screen.send_state()
 
     try:
         while True:
-            data = await websocket.receive_json()
-            await screen.ws_handler(data)
+            frame = await wire.receive_frame(websocket)
+            with metrics.handler_timer("screen", frame):
+                await screen.ws_handler(frame)
     except WebSocketDisconnect:
+        pass
+    finally:
         await game.remove_screen_client(screen)
 
 
+@app.get("/api/games")
+async def games_stats():
+    """Игры процесса: состояние, подключения, простой и примерный объём памяти."""
+    return app.state.games.stats()
+
+
+@app.get("/api/quizzes")
+async def quizzes_list():
+    """Квизы, которые можно выбрать при сбросе игры (from_admin_reset_game с полем quiz)."""
+    return quizzes.names()
+
+
+@app.get("/api/wire")
+async def wire_format():
+    """Бинарный формат для /ws/table и /ws/screen: подпротокол и имена полей по их номерам."""
+    return {"subprotocol": wire.SUBPROTOCOL_MSGPACK if wire.msgpack is not None else None, "fields": wire.FIELDS}
+
+
+@app.get("/api/wire/stats")
+async def wire_stats():
+    """Отправлено по типам событий: сообщений и байт до сжатия permessage-deflate (wire.WireStats)."""
+    return wire.stats.snapshot()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics_endpoint():
+    """Метрики процесса в формате Prometheus (data/metrics.py)."""
+    return PlainTextResponse(metrics.render(app.state.games.games), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/api/profiles.folded", response_class=PlainTextResponse)
+@app.get("/api/{game_code}/profiles.folded", response_class=PlainTextResponse)
+async def profiles_folded(game_code: str = DEFAULT_GAME):
+    """Профили шагов ведущего в формате collapsed stacks: flamegraph.pl или speedscope."""
+    game = app.state.games.games.get(game_code)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return PlainTextResponse(game.profiler.folded())
+
+
+@app.get("/api/prefetch")
+@app.get("/api/{game_code}/prefetch")
+async def prefetch(response: Response, game_code: str = DEFAULT_GAME):
+    """Картинки следующего шага игры, чтобы телефоны скачали их заранее, пока идёт вопрос."""
+    game = app.state.games.games.get(game_code)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    urls = game.prefetch_urls()
+    if urls:
+        response.headers["link"] = ", ".join(f"<{url}>; rel=prefetch" for url in urls)
+    return urls
+
+
 # Обслуживание статики React
-app.mount("/static", StaticFiles(directory="frontend/dist/static", html=True), name="static")
+@app.api_route("/static/{path:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def static_file(path: str, request: Request):
+    return await app.state.static.response(f"static/{path}", request.headers, request.method)
 
 
 # Обработка маршрутов React
@@ -90,5 +203,5 @@ app.mount("/static", StaticFiles(directory="frontend/dist/static", html=True), n
 @app.get("/screen")
 @app.get("/admin")
 @app.get("/table/{table_id}")
-async def serve_react_app():
-    return FileResponse("frontend/dist/index.html")
+async def serve_react_app(request: Request):
+    return await app.state.static.response("index.html", request.headers, cache_control="no-cache")
@@ -0,0 +1,142 @@
+"""RedisBackend против локального сервера pub/sub из bench/redis_stub.py: рассылка, переподключение, выбор лидера.
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+
+from bench.redis_stub import PubSubStub
+from data.backend import RedisBackend
+from data.obj import Game
+from data.table.models import ClientRole
+from starlette.websockets import WebSocketState
+
+
+class Stub(PubSubStub):
+    """Сервер, который может оборвать все подключения, как перезапущенный Redis."""
+
+    def __init__(self):
+        super().__init__()
+        self.writers = set()
+
+    async def handle(self, reader, writer):
+        self.writers.add(writer)
+        try:
+            await super().handle(reader, writer)
+        finally:
+            self.writers.discard(writer)
+
+    def drop_clients(self):
+        for writer in list(self.writers):
+            writer.close()
+
+
+class FakeSocket:
+    application_state = WebSocketState.CONNECTED
+    client_state = WebSocketState.CONNECTED
+
+    async def send_text(self, text: str):
+        pass
+
+    async def send_bytes(self, data: bytes):
+        pass
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+async def start_stub(stub: Stub, port: int = 0) -> asyncio.Server:
+    return await asyncio.start_server(stub.handle, "127.0.0.1", port)
+
+
+async def stop_stub(stub: Stub, server: asyncio.Server):
+    server.close()
+    stub.drop_clients()
+    await server.wait_closed()
+
+
+def make_backend(port: int) -> RedisBackend:
+    backend = RedisBackend(f"redis://127.0.0.1:{port}")
+    backend.RECONNECT_MIN = 0.01
+    backend.RECONNECT_MAX = 0.05
+    return backend
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+def test_reconnect_after_server_restart():
+    async def run():
+        stub = Stub()
+        server = await start_stub(stub)
+        port = server.sockets[0].getsockname()[1]
+        received = []
+        reconnects = []
+
+        async def on_message(code, message):
+            received.append((code, message["op"]))
+
+        async def on_reconnect():
+            reconnects.append(True)
+
+        sender, receiver = make_backend(port), make_backend(port)
+        await sender.start(on_message)
+        await receiver.start(on_message, on_reconnect)
+
+        await sender.publish("g", {"op": "first"})
+        await wait_for(lambda: ("g", "first") in received)
+
+        # Сервер недоступен: публикация не бросает исключение в обработчик клиента
+        await stop_stub(stub, server)
+        await sender.publish("g", {"op": "lost"})
+        await sender.publish("g", {"op": "lost"})
+
+        server = await start_stub(stub, port)
+        await wait_for(lambda: reconnects)
+        await wait_for(lambda: sender._pub is not None)
+        await sender.publish("g", {"op": "second"})
+        await wait_for(lambda: ("g", "second") in received)
+        assert ("g", "lost") not in received
+
+        await sender.stop()
+        await receiver.stop()
+        await stop_stub(stub, server)
+
+    asyncio.run(run())
+
+
+def test_simultaneous_leaders_settle_on_one():
+    async def run():
+        stub = Stub()
+        server = await start_stub(stub)
+        port = server.sockets[0].getsockname()[1]
+        games = []
+        for _ in range(2):
+            backend = make_backend(port)
+            game = Game("split", backend)
+            await backend.start(lambda code, message, game=game: game.apply_remote(message))
+            games.append(game)
+
+        # Телефоны подключились к разным процессам раньше, чем дошли сообщения о присутствии
+        clients = await asyncio.gather(*[game.get_table(1).add_client(FakeSocket()) for game in games])
+        # Оба стали лидерами, пока не знали друг о друге
+        assert all(hasattr(client, "leader_since") for client in clients)
+
+        tables = [game.get_table(1) for game in games]
+        await wait_for(lambda: sum(table.leader is not None for table in tables) == 1)
+        await asyncio.sleep(0.1)
+        assert sum(table.leader is not None for table in tables) == 1
+        assert [table.clients_count() for table in tables] == [2, 2]
+        assert sum(client.role == ClientRole.leader for client in clients) == 1
+
+        for client in clients:
+            client.outbox.stop()
+        for game in games:
+            game.cancel_timer()
+            await game.backend.stop()
+        await stop_stub(stub, server)
+
+    asyncio.run(run())
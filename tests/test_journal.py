@@ -0,0 +1,152 @@
+"""Журнал игры: запись, снимок и восстановление, один писатель на игру при нескольких процессах.
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+import json
+
+from bench.redis_stub import PubSubStub
+from data.backend import RedisBackend
+from data.journal import Journal, JournalWriter
+from data.obj import Game
+from data.registry import GameRegistry
+
+
+def make_journal(directory, code: str = "g", snapshot_every: int = 500) -> Journal:
+    writer = JournalWriter("never")
+    writer.start()
+    journal = Journal(writer, str(directory), code, snapshot_every)
+    # Процесс, который не пишет журнал, пробует стать писателем сразу, а не раз в секунду
+    journal.LOCK_RETRY = 0
+    return journal
+
+
+def test_record_snapshot_load(tmp_path):
+    journal = make_journal(tmp_path)
+    assert journal.acquire()
+    journal.record("set_name", {"table_id": 1, "name": "a"})
+    journal.snapshot({"tables": 1})
+    journal.record("set_name", {"table_id": 1, "name": "b"})
+    journal.record("start", {})
+    journal.writer.stop()
+
+    # Снимок начинает журнал заново: в файле только записи после него
+    with open(journal.path, encoding="utf-8") as f:
+        assert [json.loads(line)["op"] for line in f] == ["set_name", "start"]
+
+    loaded = Journal(journal.writer, str(tmp_path), "g")
+    snapshot, entries = loaded.load()
+    assert snapshot["seq"] == 1 and snapshot["data"] == {"tables": 1}
+    assert [(entry["seq"], entry["op"]) for entry in entries] == [(2, "set_name"), (3, "start")]
+    assert entries[0]["name"] == "b"
+    # Нумерация продолжается после загруженных записей
+    assert loaded.seq == 3
+
+
+def test_load_skips_torn_last_line(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.acquire()
+    journal.record("start", {})
+    journal.writer.stop()
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 2, "op": "next_q')
+
+    snapshot, entries = Journal(journal.writer, str(tmp_path), "g").load()
+    assert snapshot is None and [entry["op"] for entry in entries] == ["start"]
+
+
+def test_one_writer_per_game(tmp_path):
+    first, second = make_journal(tmp_path), make_journal(tmp_path)
+    assert first.acquire() and first.owner
+    # Файлы игры уже пишет первый процесс
+    assert not second.acquire() and not second.owner
+
+    first.close()
+    first.writer.stop()
+    assert second.acquire() and second.owner
+    second.writer.stop()
+
+
+def test_game_restore_round_trip(tmp_path):
+    async def run():
+        game = Game("g", journal=make_journal(tmp_path, snapshot_every=3))
+        await game.resize_tables(3)
+        for table_id, name in ((1, "Один"), (2, "Два"), (3, "Три")):
+            await game.get_table(table_id).set_name(name)
+        await game.start()
+        await game.get_table(2).set_table_answers([1])
+        game.cancel_timer()
+        game.journal.writer.stop()
+
+        restored = Game("g", journal=make_journal(tmp_path))
+        assert await restored.restore()
+        restored.cancel_timer()
+        restored.journal.writer.stop()
+        expected, actual = game.get_full_game_data(), restored.get_full_game_data()
+        for data in (expected, actual):
+            for question in data["questions"]:
+                question.pop("time_left")
+        assert actual == expected
+
+    asyncio.run(run())
+
+
+def test_writer_journals_changes_from_other_processes(tmp_path):
+    async def run():
+        game = Game("g", journal=make_journal(tmp_path))
+        await game.resize_tables(2)
+        await game.apply_remote({"worker": "other", "op": "set_name", "table_id": 1, "name": "Чужой"})
+        game.journal.writer.stop()
+
+        restored = Game("g", journal=make_journal(tmp_path))
+        assert await restored.restore()
+        restored.journal.writer.stop()
+        assert len(restored.tables) == 2 and restored.get_table(1).name == "Чужой"
+
+    asyncio.run(run())
+
+
+def test_new_process_prefers_peers_over_stale_journal(tmp_path):
+    async def run():
+        # Журнал на диске остался от прошлого запуска: 5 столов
+        stale = Game("g", journal=make_journal(tmp_path))
+        await stale.resize_tables(5)
+        stale.journal.writer.stop()
+
+        stub = PubSubStub()
+        server = await asyncio.start_server(stub.handle, "127.0.0.1", 0)
+        url = "redis://127.0.0.1:%d" % server.sockets[0].getsockname()[1]
+        backends = [RedisBackend(url), RedisBackend(url)]
+        registries = [GameRegistry(backend, 3600, 10, sync_timeout=1.0) for backend in backends]
+        for backend, registry in zip(backends, registries):
+            await backend.start(registry.on_message, registry.on_reconnect)
+
+        # Игра уже идёт в другом процессе: 3 стола
+        live = await registries[0].get("g")
+        await live.resize_tables(3)
+        await live.get_table(1).set_name("Живой")
+
+        writer = JournalWriter("never")
+        writer.start()
+        registries[1].journal_writer, registries[1].journal_dir = writer, str(tmp_path)
+        game = await registries[1].get("g")
+        assert len(game.tables) == 3 and game.get_table(1).name == "Живой"
+
+        # Игры нет ни в одном процессе: состояние из журнала
+        registries[1].sync_timeout = 0.1
+        stale_journal = make_journal(tmp_path, "h")
+        other = Game("h", journal=stale_journal)
+        await other.resize_tables(4)
+        stale_journal.writer.stop()
+        assert len((await registries[1].get("h")).tables) == 4
+
+        for registry in registries:
+            for game in registry.games.values():
+                game.cancel_timer()
+        for backend in backends:
+            await backend.stop()
+        writer.stop()
+        server.close()
+        await server.wait_closed()
+
+    asyncio.run(run())
@@ -0,0 +1,107 @@
+"""Места столов (data/leaderboard.py) и итоги для экранов (Game.screen_results).
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+
+from data.obj import Game
+
+
+async def skip_write_game(*args, **kwargs):
+    pass
+
+
+async def make_game(scores: dict) -> Game:
+    """Игра в итогах: scores - стол -> (очки, {категория: очки})."""
+    game = Game("leaderboard-test")
+    game.write_game = skip_write_game
+    await game.resize_tables(len(scores))
+    for table_id, (score, categories) in scores.items():
+        table = game.get_table(table_id)
+        table.result.question_score[1] = score
+        table.result.categories.update(categories)
+    await game.show_results()
+    return game
+
+
+def test_screen_results_only_winners_and_cached():
+    async def run():
+        game = await make_game({
+            1: (5, {"stepa": 1}), 2: (9, {}), 3: (7, {}), 4: (1, {}), 5: (8, {"katya": 2}), 6: (0, {}),
+        })
+        assert game.leaderboard.featured == {2, 5, 3, 1}
+        results = game.screen_results()
+        assert [winner["table_id"] for winner in results["winers"]] == [2, 5, 3]
+        assert {c: w and w["table_id"] for c, w in results["category_winners"].items()} == {
+            "stepa": 1, "katya": 5, "stepa_katya": None,
+        }
+
+        # Переименование стола не из итогов их не пересчитывает, победителя - пересчитывает
+        await game.get_table(4).set_name("Четвёртый")
+        assert game.screen_results() is results
+        await game.get_table(2).set_name("Второй")
+        assert game.screen_results()["winers"][0]["table_name"] == "Второй"
+
+    asyncio.run(run())
+
+
+def test_ties_share_places_and_keep_table_order():
+    async def run():
+        game = await make_game({1: (3, {}), 2: (5, {}), 3: (5, {}), 4: (2, {}), 5: (5, {})})
+        leaderboard = game.leaderboard
+        assert leaderboard.places == {2: 1, 3: 1, 5: 1, 1: 4, 4: 5}
+        # При равных очках выше стол с меньшим номером
+        assert leaderboard.winners == [2, 3, 5]
+        assert game.get_table_place(game.get_table(4)) == 5 and game.get_place_amount() == 5
+
+    asyncio.run(run())
+
+
+def test_category_ties_broken_by_score_and_only_answered_tables_win():
+    async def run():
+        game = await make_game({
+            1: (4, {"stepa": 2}), 2: (6, {"stepa": 2}), 3: (9, {}), 4: (1, {"katya": 0}),
+        })
+        leaderboard = game.leaderboard
+        # Равные очки категории делятся по общему счёту
+        assert leaderboard.category_places["stepa"] == {2: 1, 1: 2, 3: 3, 4: 4}
+        assert leaderboard.category_winners["stepa"] == 2
+        # Стол 3 выше по общему счёту, но не отвечал на вопросы категории
+        assert leaderboard.category_winners["katya"] == 4
+        assert leaderboard.category_winners["stepa_katya"] is None
+
+    asyncio.run(run())
+
+
+def test_score_decrease_updates_winners_on_next_results():
+    async def run():
+        game = await make_game({1: (9, {}), 2: (5, {}), 3: (4, {}), 4: (3, {})})
+        assert [w["table_id"] for w in game.screen_results()["winers"]] == [1, 2, 3]
+
+        # Ответ стола 1 пересчитан ниже, итоги подводятся заново
+        game.get_table(1).result.question_score[1] = 1
+        await game.show_results()
+        assert game.leaderboard.places[1] == 4
+        assert [w["table_id"] for w in game.screen_results()["winers"]] == [2, 3, 4]
+
+    asyncio.run(run())
+
+
+def test_table_removal_during_results():
+    async def run():
+        game = await make_game({1: (2, {}), 2: (3, {}), 3: (1, {"stepa": 1}), 4: (9, {"stepa": 5}), 5: (8, {})})
+        assert game.leaderboard.winners == [4, 5, 2] and game.leaderboard.category_winners["stepa"] == 4
+
+        # Столы 4 и 5 убраны: места, победители и число мест - среди оставшихся
+        await game.resize_tables(3)
+        assert game.leaderboard.winners == [2, 1, 3]
+        assert game.leaderboard.category_winners["stepa"] == 3
+        assert game.get_place_amount() == 3
+        assert [w["table_id"] for w in game.screen_results()["winers"]] == [2, 1, 3]
+
+        # Новый стол в итогах не участвует
+        await game.resize_tables(4)
+        assert game.get_place_amount() == 3 and 4 not in game.leaderboard.places
+        assert game.get_table(4).get_to_table_result() is None
+
+    asyncio.run(run())
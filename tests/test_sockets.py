@@ -0,0 +1,81 @@
+"""Сокеты приложения целиком (main.app через TestClient): битые и неожиданные кадры не рвут цикл сокета.
+
+Запуск: python -m pytest tests
+"""
+import json
+
+import msgpack
+import pytest
+from starlette.testclient import TestClient
+
+import main
+from data import wire
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # Журнал и game_state.json пишутся в текущую папку
+    monkeypatch.chdir(tmp_path)
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+def receive_until(ws, event_type: str) -> list:
+    """Сообщения до события event_type включительно (ping, состояние стола, ошибки)."""
+    events = []
+    while not events or events[-1].get("event_type") != event_type:
+        message = ws.receive()
+        if message.get("text") is not None:
+            events.append(json.loads(message["text"]))
+        else:
+            events.append(wire.unpack(message["bytes"]))
+    return events
+
+
+def receive_event(ws, event_type: str) -> dict:
+    return receive_until(ws, event_type)[-1]
+
+
+def default_table(table_id: int = 1):
+    return main.app.state.games.games["default"].get_table(table_id)
+
+
+def test_bad_msgpack_frame_gets_error(client):
+    with client.websocket_connect("/ws/table/1", subprotocols=[wire.SUBPROTOCOL_MSGPACK]) as ws:
+        ws.send_bytes(b"\xc1")
+        assert receive_event(ws, "error")["error"].startswith("Invalid MessagePack")
+        # Сокет жив и отвечает на следующие события
+        ws.send_bytes(wire.pack({"event_type": "from_resync"}))
+        assert receive_event(ws, "table")["role"] == "leader"
+    assert default_table().leader is None
+
+
+def test_binary_frame_without_subprotocol_gets_error(client):
+    with client.websocket_connect("/ws/table/1") as ws:
+        receive_event(ws, "table")
+        ws.send_bytes(msgpack.packb({"event_type": "from_resync"}))
+        ws.send_text(json.dumps({"event_type": "from_resync"}))
+        errors = [event for event in receive_until(ws, "table") if event.get("event_type") == "error"]
+        assert len(errors) == 1 and "subprotocol" in errors[0]["error"]
+    assert default_table().leader is None
+
+
+def test_non_string_event_type_gets_error(client):
+    with client.websocket_connect("/ws/table/1", subprotocols=[wire.SUBPROTOCOL_MSGPACK]) as ws:
+        # Под номером поля event_type - список: тип до разбора "unknown", сам кадр не проходит проверку
+        assert wire.event_type(msgpack.packb({0: [1]})) == "unknown"
+        ws.send_bytes(msgpack.packb({0: [1]}))
+        receive_event(ws, "error")
+        ws.send_bytes(wire.pack({"event_type": "from_resync"}))
+        assert receive_event(ws, "table")["role"] == "leader"
+    assert default_table().leader is None
+
+
+def test_wire_stats_count_sent_bytes(client):
+    before = client.get("/api/wire/stats").json().get("table", {"messages": 0, "bytes": 0})
+    with client.websocket_connect("/ws/table/1") as ws:
+        state = receive_until(ws, "table")[-1]
+    after = client.get("/api/wire/stats").json()["table"]
+    # Размер до сжатия: столько байт текста отдано транспорту, permessage-deflate сжимает их уже в uvicorn
+    assert after["messages"] == before["messages"] + 1
+    assert after["bytes"] - before["bytes"] == len(json.dumps(state, ensure_ascii=False, separators=(",", ":")).encode())
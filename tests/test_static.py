@@ -0,0 +1,59 @@
+"""Раздача статики: какие файлы кэшируются навсегда, файлы, добавленные после старта.
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+import os
+
+from data.static import IMMUTABLE_CACHE_CONTROL, StaticAssets
+
+
+def write(directory, path: str, data: bytes = b"x" * 100):
+    full_path = os.path.join(directory, path)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        f.write(data)
+
+
+def test_immutable_only_for_build_assets_and_derived(tmp_path):
+    for path in (
+            "static/assets/index-BQk3XyZa.js", "static/_derived/0123456789abcdef-480.webp",
+            # Файлы из public/static: имя похоже на хэшированное, но файл заменяют под тем же именем
+            "static/save-the-date.png", "static/wedding-ceremony.jpg", "static/quiz/7_q.jpg",
+    ):
+        write(tmp_path, path)
+    static = StaticAssets(str(tmp_path), max_age=300)
+    static.scan()
+
+    async def cache_control(path: str) -> str:
+        return (await static.response(path, {})).headers["cache-control"]
+
+    async def run():
+        assert await cache_control("static/assets/index-BQk3XyZa.js") == IMMUTABLE_CACHE_CONTROL
+        assert await cache_control("static/_derived/0123456789abcdef-480.webp") == IMMUTABLE_CACHE_CONTROL
+        for path in ("static/save-the-date.png", "static/wedding-ceremony.jpg", "static/quiz/7_q.jpg"):
+            assert await cache_control(path) == "public, max-age=300"
+
+    asyncio.run(run())
+
+
+def test_file_added_or_replaced_after_scan(tmp_path):
+    static = StaticAssets(str(tmp_path))
+    static.scan()
+
+    async def run():
+        assert (await static.response("static/new.txt", {})).status_code == 404
+        write(tmp_path, "static/new.txt", b"first")
+        response = await static.response("static/new.txt", {})
+        assert response.status_code == 200 and response.body == b"first"
+
+        write(tmp_path, "static/new.txt", b"second")
+        os.utime(os.path.join(tmp_path, "static/new.txt"), (1, 1))
+        response = await static.response("static/new.txt", {})
+        assert response.body == b"second"
+        # ETag прежней версии больше не подходит
+        assert (await static.response("static/new.txt", {"if-none-match": response.headers["etag"]})).status_code == 304
+
+        assert (await static.response("../outside.txt", {})).status_code == 404
+
+    asyncio.run(run())
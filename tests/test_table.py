@@ -0,0 +1,204 @@
+"""Состояние стола по протоколам: полное состояние с ролью (протокол 1), версии и патчи (протокол 2).
+
+Запуск: python -m pytest tests
+"""
+import asyncio
+import json
+
+from data.obj import Game
+from data.patch import make_patch
+from data.table.models import ClientRole
+from starlette.websockets import WebSocketState
+
+
+class RecordingSocket:
+    """Сокет, который запоминает отправленные сообщения (только JSON-текст)."""
+    application_state = WebSocketState.CONNECTED
+    client_state = WebSocketState.CONNECTED
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text: str):
+        self.sent.append(json.loads(text))
+
+    async def send_bytes(self, data: bytes):
+        raise AssertionError("binary frame on a JSON socket")
+
+    async def close(self, code: int = 1000):
+        pass
+
+    def states(self) -> list:
+        """Состояния и патчи стола без ping и прочих событий; список очищается."""
+        states = [event for event in self.sent if event["event_type"] in ("table", "table_patch")]
+        self.sent = []
+        return states
+
+
+async def flush():
+    # Дать писателям очередей сокетов отправить накопленное
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+async def make_game() -> Game:
+    game = Game("table-test")
+    await game.resize_tables(1)
+    return game
+
+
+def stop(game: Game):
+    for table in game.tables.values():
+        for client in table.observers + ([table.leader] if table.leader else []):
+            client.outbox.stop()
+    game.cancel_timer()
+
+
+def test_make_patch():
+    old = {"name": None, "clients": 1, "result": {"score": 1, "place": 2}, "answers": [1], "a/b": 1}
+    new = {"name": "x", "clients": 1, "result": {"score": 3}, "answers": [1, 2], "c~d": 2}
+    assert make_patch(old, new) == [
+        {"op": "replace", "path": "/name", "value": "x"},
+        {"op": "replace", "path": "/result/score", "value": 3},
+        {"op": "remove", "path": "/result/place"},
+        {"op": "replace", "path": "/answers", "value": [1, 2]},
+        {"op": "remove", "path": "/a~1b"},
+        {"op": "add", "path": "/c~0d", "value": 2},
+    ]
+    assert make_patch(old, old) == []
+
+
+def test_protocol1_gets_full_state_with_role():
+    async def run():
+        game = await make_game()
+        table = game.get_table(1)
+        leader_socket, observer_socket = RecordingSocket(), RecordingSocket()
+        await table.add_client(leader_socket)
+        await table.add_client(observer_socket)
+        await flush()
+        leader_socket.states(), observer_socket.states()
+
+        await table.set_name("Столик")
+        await flush()
+        [leader_state] = leader_socket.states()
+        [observer_state] = observer_socket.states()
+        assert leader_state["event_type"] == observer_state["event_type"] == "table"
+        assert (leader_state["role"], observer_state["role"]) == ("leader", "observer")
+        assert leader_state["table_name"] == "Столик" and "version" not in leader_state
+        stop(game)
+
+    asyncio.run(run())
+
+
+def test_protocol2_gets_patches_and_full_state_after_gap():
+    async def run():
+        game = await make_game()
+        table = game.get_table(1)
+        socket = RecordingSocket()
+        client = await table.add_client(socket, protocol=2)
+        await flush()
+        [first] = socket.states()
+        assert first["event_type"] == "table" and first["version"] == table.version
+
+        await table.set_name("Первый")
+        await flush()
+        [patch] = socket.states()
+        assert patch == {
+            "event_type": "table_patch", "version": first["version"] + 1,
+            "patch": [{"op": "replace", "path": "/table_name", "value": "Первый"}],
+        }
+
+        # Клиент пропустил версию: патч к ней не подходит, приходит полное состояние
+        client.version -= 1
+        await table.set_name("Второй")
+        await flush()
+        [state] = socket.states()
+        assert state["event_type"] == "table" and state["version"] == table.version
+        assert state["table_name"] == "Второй" and state["role"] == "leader"
+
+        # Состояние не изменилось - ничего не отправляется
+        await table.notify_clients()
+        await flush()
+        assert socket.states() == []
+        stop(game)
+
+    asyncio.run(run())
+
+
+def test_promoted_client_gets_full_state_with_new_role():
+    async def run():
+        game = await make_game()
+        table = game.get_table(1)
+        # Лидер стола подключен к другому процессу, здесь только наблюдатель
+        await table.apply_presence("other-worker", leader=True, observers=0, since=1.0)
+        socket = RecordingSocket()
+        client = await table.add_client(socket, protocol=2)
+        await flush()
+        assert socket.states()[-1]["role"] == "observer"
+
+        # Лидер ушёл: наблюдатель становится лидером и должен узнать об этом из полного состояния
+        await table.apply_presence("other-worker", leader=False, observers=0)
+        await flush()
+        assert client.role == ClientRole.leader
+        states = socket.states()
+        assert states[0]["event_type"] == "table" and states[0]["role"] == "leader"
+        assert states[-1].get("version", table.version) == table.version
+        stop(game)
+
+    asyncio.run(run())
+
+
+def test_change_leader_sends_full_state_to_both():
+    async def run():
+        game = await make_game()
+        table = game.get_table(1)
+        leader_socket, observer_socket = RecordingSocket(), RecordingSocket()
+        await table.add_client(leader_socket, protocol=2)
+        observer = await table.add_client(observer_socket, protocol=2)
+        await flush()
+        leader_socket.states(), observer_socket.states()
+
+        await table.change_leader()
+        await flush()
+        assert observer.role == ClientRole.leader
+        # Роль приходит полным состоянием, дальше - патчи к нему (число клиентов на время смены)
+        for socket, role in ((observer_socket, "leader"), (leader_socket, "observer")):
+            states = socket.states()
+            assert states[0]["event_type"] == "table" and states[0]["role"] == role
+            assert all(state["event_type"] == "table_patch" for state in states[1:])
+            assert states[-1]["version"] == table.version
+        stop(game)
+
+    asyncio.run(run())
+
+
+def test_closed_question_in_table_screen_and_saved_state():
+    async def run():
+        game = await make_game()
+        await game.start()
+        socket = RecordingSocket()
+        await game.get_table(1).add_client(socket)
+        await flush()
+        assert socket.states()[-1]["question"]["closed"] is False
+
+        # Время вышло: закрытие видно в состоянии стола и экрана и без автопоказа ответов
+        await game.close_question()
+        await flush()
+        assert socket.states()[-1]["question"]["closed"] is True
+        game.commit_screen_state()
+        assert json.loads(game.screen_state_body)["question"]["closed"] is True
+
+        data = game.get_full_game_data()
+        assert data["questions"][data["current_question_index"]]["closed"] is True
+        restored = Game("table-test")
+        restored.load_full_game_data(data)
+        assert restored.question_manager.current_question.closed
+        assert restored._timer_task is None
+
+        # Новый отсчёт таймера снова открывает вопрос
+        await game.set_timer(30, paused=False)
+        await flush()
+        assert socket.states()[-1]["question"]["closed"] is False
+        stop(game)
+
+    asyncio.run(run())